@@ -1,25 +1,133 @@
 # chappie.py
 
+import time
+STARTUP_STARTED = time.perf_counter()
+
 import sys
 import os
+import threading
+from concurrent.futures import CancelledError
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QFileDialog, QProgressBar, QListWidget,
-                             QTreeWidget, QTreeWidgetItem, QSplitter, QTextEdit, QInputDialog,
+                             QTreeView, QListWidgetItem, QSplitter, QTextEdit, QInputDialog,
                              QLineEdit, QMessageBox, QProgressDialog)
-from PyQt6.QtCore import Qt, QUrl, pyqtSignal, QTimer, QSettings, QThread
+from PyQt6.QtCore import (Qt, QUrl, QRectF, QLineF, pyqtSignal, QTimer, QSettings, QThread, QAbstractItemModel,
+                          QModelIndex, QSortFilterProxyModel)
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
 import pyqtgraph as pg
 import numpy as np
-import librosa
 import logging
+from chappie_audio import (PeakBuilder, PeakPyramid, open_audio_blocks, load_cached_peaks, save_cached_peaks,
+                           find_sibling_audio)
+from chappie_batch import BatchProcessor, content_hash
+from chappie_dedup import DedupStore
+from chappie_logging import setup_logging
+from chappie_metrics import Metrics
 from chappie_processor import ChappieProcessor
-from chappie_utils import seconds_to_time, time_to_seconds
+from chappie_results import load_results, save_results
+from chappie_search import TranscriptIndex
+from chappie_utils import SrtCues, TimelineIndex, default_cache_dir, seconds_to_time, time_to_seconds
+
+class ChapterOverlay(pg.GraphicsObject):
+    """
+    All chapter spans as one graphics item, painted in a single pass.
+
+    Spans are kept sorted by start so painting only visits the chapters in the
+    visible range and hit-testing is a binary search.
+    """
+    chapter_clicked = pyqtSignal(int)
 
-# Set up logging
-logging.basicConfig(filename='chappie.log', level=logging.DEBUG)
+    def __init__(self):
+        super().__init__()
+        self.starts = np.empty(0)
+        self.ends = np.empty(0)
+        # Running max of ends, so visible spans can be found by binary search even if spans overlap
+        self.reach = np.empty(0)
+        self.order = np.empty(0, dtype=np.int64)
+        self.labels = []
+        self.hovered = -1
+        self.bounds = None
+        self.brushes = (pg.mkBrush(100, 100, 255, 50), pg.mkBrush(100, 180, 255, 50))
+        self.hover_brush = pg.mkBrush(100, 100, 255, 110)
+        self.edge_pen = pg.mkPen(100, 100, 255, 160)
+        self.setZValue(-10)
+
+    def set_chapters(self, chapters):
+        """Replace every span at once; chapters are dicts with start, end and optionally title."""
+        starts = np.array([chapter['start'] for chapter in chapters], dtype=np.float64)
+        ends = np.array([chapter['end'] for chapter in chapters], dtype=np.float64)
+        self.order = np.argsort(starts, kind='stable')
+        self.starts = starts[self.order]
+        self.ends = ends[self.order]
+        self.reach = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+        self.labels = [chapters[i].get('title', f"Chapter {i + 1}") for i in self.order.tolist()]
+        self.hovered = -1
+        self.setToolTip("")
+        self.prepareGeometryChange()
+        self.bounds = None
+        self.update()
+
+    def chapter_at(self, x):
+        """:return: Index (in the order given to set_chapters) of the chapter under x, or -1"""
+        position = self.position_at(x)
+        return int(self.order[position]) if position >= 0 else -1
+
+    def position_at(self, x):
+        position = int(np.searchsorted(self.starts, x, side='right')) - 1
+        return position if position >= 0 and x <= self.ends[position] else -1
+
+    def viewRangeChanged(self):
+        self.prepareGeometryChange()
+        self.bounds = None
+
+    def boundingRect(self):
+        if self.bounds is None:
+            view_rect = self.viewRect()
+            if view_rect is None or not len(self.starts):
+                return QRectF()
+            self.bounds = QRectF(view_rect)
+        return self.bounds
+
+    def paint(self, painter, *args):
+        view_rect = self.viewRect()
+        if view_rect is None or not len(self.starts):
+            return
+        first = int(np.searchsorted(self.reach, view_rect.left(), side='left'))
+        last = int(np.searchsorted(self.starts, view_rect.right(), side='right'))
+        top, height = view_rect.top(), view_rect.height()
+        painter.setPen(Qt.PenStyle.NoPen)
+        for parity, brush in enumerate(self.brushes):
+            # Alternate fills so adjacent chapters stay distinguishable; by absolute position, so a
+            # chapter keeps its colour as panning scrolls others in and out of view
+            rects = [QRectF(self.starts[i], top, self.ends[i] - self.starts[i], height)
+                     for i in range(first + (first + parity) % 2, last, 2) if i != self.hovered]
+            if rects:
+                painter.setBrush(brush)
+                painter.drawRects(rects)
+        if first <= self.hovered < last:
+            painter.setBrush(self.hover_brush)
+            painter.drawRect(QRectF(self.starts[self.hovered], top,
+                                    self.ends[self.hovered] - self.starts[self.hovered], height))
+        painter.setPen(self.edge_pen)
+        painter.drawLines([QLineF(self.starts[i], top, self.starts[i], top + height) for i in range(first, last)])
+
+    def hoverEvent(self, event):
+        position = -1 if event.isExit() else self.position_at(event.pos().x())
+        if position != self.hovered:
+            self.hovered = position
+            self.setToolTip(self.labels[position] if position >= 0 else "")
+            self.update()
+
+    def mouseClickEvent(self, event):
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
+        chapter = self.chapter_at(event.pos().x())
+        if chapter >= 0:
+            self.chapter_clicked.emit(chapter)
 
 class WaveformWidget(pg.PlotWidget):
     region_selected = pyqtSignal(float, float)
+    chapter_clicked = pyqtSignal(int)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -30,30 +138,34 @@ class WaveformWidget(pg.PlotWidget):
         self.playhead = pg.InfiniteLine(pos=0, angle=90, movable=False, pen='r')
         self.addItem(self.playhead)
         self.waveform_item = None
-        self.time_axis = None
+        self.peaks = None
         self.audio_duration = 0
-        self.chapter_regions = []
+        self.chapter_overlay = ChapterOverlay()
+        self.chapter_overlay.chapter_clicked.connect(self.chapter_clicked)
+        self.addItem(self.chapter_overlay)
 
         self.scene().sigMouseClicked.connect(self.on_mouse_clicked)
+        self.getViewBox().sigXRangeChanged.connect(self.update_level_of_detail)
 
         self.time_axis_item = pg.AxisItem(orientation='bottom')
         self.setAxisItems({'bottom': self.time_axis_item})
 
     def plot_waveform(self, y, sr):
+        self.plot_peaks(PeakPyramid.from_signal(y, sr))
+
+    def plot_peaks(self, peaks):
         try:
             self.clear()
+            self.addItem(self.chapter_overlay)
             self.addItem(self.playhead)
-            self.time_axis = np.arange(0, len(y)) / sr
-            self.audio_duration = len(y) / sr
+            self.peaks = peaks
+            self.audio_duration = peaks.duration
 
-            downsample_factor = max(1, len(y) // 10000)
-            y_downsampled = y[::downsample_factor]
-            time_downsampled = self.time_axis[::downsample_factor]
-
-            self.waveform_item = pg.PlotCurveItem(time_downsampled, y_downsampled, pen='b')
+            self.waveform_item = pg.PlotCurveItem(pen='b', skipFiniteCheck=True)
             self.addItem(self.waveform_item)
             self.setXRange(0, self.audio_duration)
-            self.setYRange(y.min(), y.max())
+            self.setYRange(*peaks.amplitude_range())
+            self.update_level_of_detail()
 
             self.time_axis_item.setScale(1)
             self.time_axis_item.setTickSpacing(60, 30)
@@ -61,6 +173,24 @@ class WaveformWidget(pg.PlotWidget):
         except Exception as e:
             logging.exception(f"Error plotting waveform: {str(e)}")
 
+    def update_peaks(self, peaks):
+        # Swap in newer peaks for the same file (progressive decode) without resetting the view
+        if self.waveform_item is None:
+            self.plot_peaks(peaks)
+            return
+        self.peaks = peaks
+        self.setYRange(*peaks.amplitude_range())
+        self.update_level_of_detail()
+
+    def update_level_of_detail(self, *args):
+        # Redraw only the visible window from the pyramid level matching the screen resolution
+        if self.peaks is None or self.waveform_item is None:
+            return
+        x_min, x_max = self.viewRange()[0]
+        max_points = max(int(self.getViewBox().width()), 500)
+        times, values = self.peaks.window(x_min, x_max, max_points)
+        self.waveform_item.setData(times, values)
+
     def update_playhead(self, position):
         self.playhead.setPos(position)
 
@@ -97,10 +227,8 @@ class WaveformWidget(pg.PlotWidget):
                 if 0 <= x <= self.audio_duration:
                     self.region_selected.emit(x, x)
 
-    def add_chapter_region(self, start_time, end_time):
-        region = pg.LinearRegionItem([start_time, end_time], movable=False, brush=pg.mkBrush(100, 100, 255, 50))
-        self.addItem(region)
-        self.chapter_regions.append(region)
+    def set_chapters(self, chapters):
+        self.chapter_overlay.set_chapters(chapters)
 
 class FileManager:
     def __init__(self):
@@ -131,22 +259,196 @@ class ChapterManager:
     def get_chapters(self):
         return self.chapters
 
+class TocModel(QAbstractItemModel):
+    """
+    Two-level table of contents (files, then their chapters) read straight from the results.
+
+    No per-item objects are built: a file's chapter rows are exposed in
+    batches through canFetchMore/fetchMore as the view expands it, and files
+    are appended one row at a time as batch results stream in.
+    """
+    FETCH_BATCH = 100
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # {'name', 'labels': chapter label strings, 'error', 'fetched': chapter rows exposed so far}
+        self.files = []
+
+    def add_file(self, name, labels, error=None):
+        row = len(self.files)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.files.append({'name': name, 'labels': labels, 'error': error, 'fetched': 0})
+        self.endInsertRows()
+        return self.index(row, 0)
+
+    def clear(self):
+        self.beginResetModel()
+        self.files = []
+        self.endResetModel()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, 0)
+        # A chapter row's internal id is its file's row + 1; 0 marks file rows
+        return self.createIndex(row, column, parent.row() + 1)
+
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == 0:
+            return QModelIndex()
+        return self.createIndex(index.internalId() - 1, 0, 0)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self.files)
+        if parent.internalId() == 0:
+            return self.files[parent.row()]['fetched']
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self.files)
+        return parent.internalId() == 0 and bool(self.files[parent.row()]['labels'])
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or parent.internalId() != 0 or parent.row() >= len(self.files):
+            return False
+        entry = self.files[parent.row()]
+        return entry['fetched'] < len(entry['labels'])
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        entry = self.files[parent.row()]
+        first = entry['fetched']
+        last = min(first + self.FETCH_BATCH, len(entry['labels'])) - 1
+        self.beginInsertRows(parent, first, last)
+        entry['fetched'] = last + 1
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if index.internalId() == 0:
+            entry = self.files[index.row()]
+            return f"{entry['name']} (failed: {entry['error']})" if entry['error'] else entry['name']
+        return f"Chapter {index.row() + 1}: {self.files[index.internalId() - 1]['labels'][index.row()]}"
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return "Table of Contents"
+        return None
+
+class TocFilterProxy(QSortFilterProxyModel):
+    """
+    Filters the TOC by file name or chapter label.
+
+    Matches are checked against the source model's strings rather than its
+    rows, so a file whose chapters were never fetched still matches on them.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.text = ""
+
+    def set_filter_text(self, text):
+        self.text = text.casefold()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self.text:
+            return True
+        files = self.sourceModel().files
+        if not source_parent.isValid():
+            entry = files[source_row]
+            return self.text in entry['name'].casefold() or any(
+                self.text in label.casefold() for label in entry['labels'])
+        entry = files[source_parent.row()]
+        return self.text in entry['name'].casefold() or self.text in entry['labels'][source_row].casefold()
+
 class ProcessingThread(QThread):
+    chapter_ready = pyqtSignal(int, dict, str, int, int)
     finished = pyqtSignal(dict)
+    cancelled = pyqtSignal()
     error = pyqtSignal(str)
 
-    def __init__(self, processor, srt_content):
+    def __init__(self, processor, srt_content, pauses=None, previous=None):
         super().__init__()
         self.processor = processor
         self.srt_content = srt_content
+        self.pauses = pauses
+        self.previous = previous
+        # Per run, so cancelling here never touches a batch sharing the processor
+        self.cancel_event = threading.Event()
 
     def run(self):
         try:
-            result = self.processor.process_srt(self.srt_content)
+            result = self.processor.process_srt(self.srt_content, self.pauses, self.previous,
+                                                self.chapter_ready.emit, self.cancel_event)
             self.finished.emit(result)
+        except CancelledError:
+            self.cancelled.emit()
         except Exception as e:
             self.error.emit(str(e))
 
+    def cancel(self):
+        self.cancel_event.set()
+
+class BatchThread(QThread):
+    file_completed = pyqtSignal(str, dict)
+    finished = pyqtSignal(dict)
+    error = pyqtSignal(str)
+
+    def __init__(self, processor, directory, workers=4, search_index=None):
+        super().__init__()
+        self.batch = BatchProcessor(processor, workers, search_index=search_index)
+        self.directory = directory
+
+    def run(self):
+        try:
+            records = self.batch.process_directory(self.directory, self.file_completed.emit)
+            self.finished.emit(records)
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def cancel(self):
+        self.batch.cancel()
+
+class AudioDecodeThread(QThread):
+    peaks_ready = pyqtSignal(object)
+    decoded = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, file_path, update_interval=0.25):
+        super().__init__()
+        self.file_path = file_path
+        self.update_interval = update_interval
+
+    def run(self):
+        try:
+            sample_rate, total_frames, blocks = open_audio_blocks(self.file_path)
+            builder = PeakBuilder(sample_rate, total_frames)
+            last_update = time.monotonic()
+            for block in blocks:
+                if self.isInterruptionRequested():
+                    return
+                builder.add(block)
+                if time.monotonic() - last_update >= self.update_interval:
+                    self.peaks_ready.emit(builder.partial())
+                    last_update = time.monotonic()
+            if self.isInterruptionRequested():
+                return
+            peaks = builder.finish()
+            save_cached_peaks(self.file_path, peaks)
+            self.decoded.emit(peaks)
+        except Exception as e:
+            logging.exception(f"Error decoding audio file: {str(e)}")
+            self.error.emit(str(e))
+
 class ChappieGUI(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -159,13 +461,32 @@ class ChappieGUI(QMainWindow):
         self.file_manager = FileManager()
         self.chapter_manager = ChapterManager()
         self.chappie_processor = None
+        self.decode_thread = None
+        self.retired_threads = []
+        self.current_audio_path = None
+        # Fully decoded peaks of the current audio, the only ones whose RMS can place chapter boundaries
+        self.audio_peaks = None
+        # Chapters sidecar of the current audio: {'srt_hash', 'model', 'result'}
+        self.saved_results = None
+        # (audio path, SRT hash) of the run in progress, for saving its sidecar
+        self.processing_source = None
+        self.cues = None
+        self.chapter_index = TimelineIndex([])
+        self.cue_index = TimelineIndex([])
+        self.active_chapter = -1
+        self.active_cue = -1
+        self.search_index = TranscriptIndex()
         self.settings = QSettings("YourCompany", "Chappie")
+        # Shared by every processor this window creates, plus app-level timings such as startup
+        self.metrics = Metrics()
 
         self.setup_ui()
 
         self.media_player = QMediaPlayer()
         self.audio_output = QAudioOutput()
         self.media_player.setAudioOutput(self.audio_output)
+        # The player reports its own position while playing and on every seek, so nothing polls it
+        self.media_player.positionChanged.connect(self.on_position_changed)
 
     def setup_ui(self):
         self.load_audio_button = QPushButton("Load Audio")
@@ -174,6 +495,7 @@ class ChappieGUI(QMainWindow):
 
         self.waveform_widget = WaveformWidget()
         self.waveform_widget.region_selected.connect(self.on_waveform_clicked)
+        self.waveform_widget.chapter_clicked.connect(self.on_waveform_chapter_clicked)
         self.layout.addWidget(self.waveform_widget)
 
         playback_layout = QHBoxLayout()
@@ -189,6 +511,11 @@ class ChappieGUI(QMainWindow):
         self.chapter_list.itemClicked.connect(self.on_chapter_clicked)
         self.layout.addWidget(self.chapter_list)
 
+        self.transcript_list = QListWidget()
+        self.transcript_list.setUniformItemSizes(True)
+        self.transcript_list.itemClicked.connect(self.on_transcript_clicked)
+        self.layout.addWidget(self.transcript_list)
+
         self.chapter_summary = QTextEdit()
         self.chapter_summary.setReadOnly(True)
         self.layout.addWidget(self.chapter_summary)
@@ -205,9 +532,36 @@ class ChappieGUI(QMainWindow):
         self.process_directory_button.clicked.connect(self.process_directory)
         self.layout.addWidget(self.process_directory_button)
 
-        self.toc_tree = QTreeWidget()
-        self.toc_tree.setHeaderLabels(["Table of Contents"])
-        self.layout.addWidget(self.toc_tree)
+        self.toc_filter = QLineEdit()
+        self.toc_filter.setPlaceholderText("Filter table of contents...")
+        self.toc_filter_timer = QTimer(self)
+        self.toc_filter_timer.setSingleShot(True)
+        self.toc_filter_timer.setInterval(150)
+        self.toc_filter_timer.timeout.connect(lambda: self.toc_proxy.set_filter_text(self.toc_filter.text()))
+        self.toc_filter.textChanged.connect(lambda _: self.toc_filter_timer.start())
+        self.layout.addWidget(self.toc_filter)
+
+        self.toc_model = TocModel(self)
+        self.toc_proxy = TocFilterProxy(self)
+        self.toc_proxy.setSourceModel(self.toc_model)
+        self.toc_view = QTreeView()
+        self.toc_view.setModel(self.toc_proxy)
+        self.toc_view.setUniformRowHeights(True)
+        self.layout.addWidget(self.toc_view)
+
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search transcripts...")
+        # Search once typing pauses rather than on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_box.textChanged.connect(lambda _: self.search_timer.start())
+        self.layout.addWidget(self.search_box)
+
+        self.search_results = QListWidget()
+        self.search_results.itemClicked.connect(self.on_search_result_clicked)
+        self.layout.addWidget(self.search_results)
 
     def load_audio_file(self):
         try:
@@ -217,23 +571,65 @@ class ChappieGUI(QMainWindow):
             if file_dialog.exec():
                 file_paths = file_dialog.selectedFiles()
                 if file_paths:
-                    file_path = file_paths[0]
-                    QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
-                    self.file_manager.check_files(file_path)
-                    self.update_file_status()
-                    y, sr = librosa.load(file_path, sr=None)
-                    self.waveform_widget.plot_waveform(y, sr)
-                    self.media_player.setSource(QUrl.fromLocalFile(file_path))
-                    QApplication.restoreOverrideCursor()
-                    
-                    # Check if SRT file exists and update UI
-                    if not self.file_manager.srt_path:
-                        QMessageBox.warning(self, "No SRT File", "No corresponding SRT file found.")
+                    self.open_audio_file(file_paths[0])
         except Exception as e:
-            QApplication.restoreOverrideCursor()
             logging.exception(f"Error loading audio file: {str(e)}")
             QMessageBox.critical(self, "Error", f"Failed to load audio file: {str(e)}")
 
+    def open_audio_file(self, file_path, interactive=True):
+        self.cancel_audio_decode()
+        self.current_audio_path = file_path
+        self.audio_peaks = None
+        self.file_manager.check_files(file_path)
+        self.media_player.setSource(QUrl.fromLocalFile(file_path))
+        self.load_transcript(self.file_manager.srt_path)
+        self.load_saved_chapters(file_path)
+
+        peaks = load_cached_peaks(file_path)
+        if peaks is not None:
+            self.audio_peaks = peaks
+            self.waveform_widget.plot_peaks(peaks)
+        else:
+            self.start_audio_decode(file_path)
+
+        if interactive:
+            self.update_file_status()
+            # Check if SRT file exists and update UI
+            if not self.file_manager.srt_path:
+                QMessageBox.warning(self, "No SRT File", "No corresponding SRT file found.")
+
+    def start_audio_decode(self, file_path):
+        self.waveform_widget.waveform_item = None
+        self.waveform_widget.peaks = None
+        self.decode_thread = AudioDecodeThread(file_path)
+        self.decode_thread.peaks_ready.connect(self.waveform_widget.update_peaks)
+        self.decode_thread.decoded.connect(self.on_audio_decoded)
+        self.decode_thread.error.connect(self.on_audio_decode_error)
+        self.decode_thread.start()
+        self.statusBar().showMessage("Decoding audio...")
+
+    def cancel_audio_decode(self):
+        thread = self.decode_thread
+        self.decode_thread = None
+        if thread is None or not thread.isRunning():
+            return
+        thread.requestInterruption()
+        thread.peaks_ready.disconnect()
+        thread.decoded.disconnect()
+        thread.error.disconnect()
+        # Keep a reference until the worker notices the interruption and exits
+        self.retired_threads.append(thread)
+        thread.finished.connect(lambda: self.retired_threads.remove(thread))
+
+    def on_audio_decoded(self, peaks):
+        self.audio_peaks = peaks
+        self.waveform_widget.update_peaks(peaks)
+        self.statusBar().clearMessage()
+
+    def on_audio_decode_error(self, error_message):
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Error", f"Failed to load audio file: {error_message}")
+
     def toggle_play_pause(self):
         if self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
             self.media_player.pause()
@@ -241,22 +637,76 @@ class ChappieGUI(QMainWindow):
         else:
             self.media_player.play()
             self.play_pause_button.setText("Pause")
-        QTimer.singleShot(100, self.update_playhead)
 
     def stop_audio(self):
         self.media_player.stop()
         self.play_pause_button.setText("Play")
 
-    def update_playhead(self):
-        if self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
-            position = self.media_player.position() / 1000.0
-            self.waveform_widget.update_playhead(position)
-            QTimer.singleShot(100, self.update_playhead)
+    def load_transcript(self, srt_path):
+        self.transcript_list.clear()
+        self.cues = SrtCues.from_file(srt_path) if srt_path else None
+        self.cue_index = TimelineIndex(self.cues.starts if self.cues is not None else [])
+        self.active_cue = -1
+        if self.cues is not None:
+            self.transcript_list.addItems([f"[{seconds_to_time(self.cues.starts[i])}] {self.cues.text_of(i)}"
+                                           for i in range(len(self.cues))])
+
+    def load_saved_chapters(self, audio_path):
+        self.saved_results = load_results(audio_path)
+        if self.saved_results is None:
+            self.show_result({'chapters': [], 'chapter_summaries': [], 'overall_summary': ''})
+            self.chapter_summary.clear()
+            return
+        self.show_result(self.saved_results['result'])
+        if self.file_manager.srt_path:
+            with open(self.file_manager.srt_path, 'r', encoding='utf-8') as srt_file:
+                if content_hash(srt_file.read()) != self.saved_results['srt_hash']:
+                    self.statusBar().showMessage(
+                        "Transcript changed since these chapters were generated; Process Chapters updates the changed ones.")
+
+    def show_result(self, result):
+        self.chapter_manager.chapters = result['chapters']
+        self.update_chapter_list()
+        self.update_table_of_contents()
+        if result['overall_summary']:
+            self.chapter_summary.setText(f"Overall Summary: {result['overall_summary']}")
+        self.waveform_widget.set_chapters(result['chapters'])
+
+    def on_position_changed(self, position):
+        seconds = position / 1000.0
+        self.waveform_widget.update_playhead(seconds)
+        self.sync_active_items(seconds)
+
+    def sync_active_items(self, seconds):
+        # Touch the lists only when playback crosses into another chapter or cue
+        chapter = self.chapter_index.find(seconds)
+        if chapter != self.active_chapter:
+            self.active_chapter = chapter
+            if chapter >= 0:
+                self.chapter_list.setCurrentRow(chapter)
+            else:
+                self.chapter_list.clearSelection()
+        cue = self.cue_index.find(seconds)
+        if cue != self.active_cue:
+            self.active_cue = cue
+            if cue >= 0:
+                self.transcript_list.setCurrentRow(cue)
+                self.transcript_list.scrollToItem(self.transcript_list.item(cue),
+                                                  QListWidget.ScrollHint.PositionAtCenter)
+            else:
+                self.transcript_list.clearSelection()
 
     def on_waveform_clicked(self, time, _):
         self.media_player.setPosition(int(time * 1000))
         self.waveform_widget.update_playhead(time)
 
+    def on_waveform_chapter_clicked(self, index):
+        # The click itself already seeks; just bring the chapter's details forward
+        self.chapter_list.setCurrentRow(index)
+        chapter = self.chapter_manager.get_chapters()[index]
+        if 'summary' in chapter:
+            self.chapter_summary.setText(f"Chapter Summary: {chapter['summary']}")
+
     def on_chapter_clicked(self, item):
         index = self.chapter_list.row(item)
         chapter = self.chapter_manager.get_chapters()[index]
@@ -265,11 +715,21 @@ class ChappieGUI(QMainWindow):
         if 'summary' in chapter:
             self.chapter_summary.setText(f"Chapter Summary: {chapter['summary']}")
 
+    def on_transcript_clicked(self, item):
+        start = float(self.cues.starts[self.transcript_list.row(item)])
+        self.media_player.setPosition(int(start * 1000))
+        self.play_audio()
+
+    def create_processor(self, api_key):
+        # Near-duplicate chapters (intros, sponsor reads) reuse one summary across files unless turned off
+        dedup = DedupStore() if self.settings.value("dedup", True, type=bool) else None
+        return ChappieProcessor(api_key, metrics=self.metrics, dedup=dedup)
+
     def set_api_key(self):
         api_key, ok = QInputDialog.getText(self, "Set API Key", "Enter your OpenAI API Key:", QLineEdit.EchoMode.Password)
         if ok and api_key:
             self.settings.setValue("api_key", api_key)
-            self.chappie_processor = ChappieProcessor(api_key)
+            self.chappie_processor = self.create_processor(api_key)
             QMessageBox.information(self, "API Key Set", "API Key has been set successfully.")
 
     def process_chapters(self):
@@ -284,37 +744,89 @@ class ChappieGUI(QMainWindow):
         try:
             with open(self.file_manager.srt_path, 'r', encoding='utf-8') as srt_file:
                 srt_content = srt_file.read()
-            
+            self.search_index.index_file(self.file_manager.srt_path, srt_content)
+            self.processing_source = (self.current_audio_path, content_hash(srt_content))
+            previous = self.saved_results['result'] if self.saved_results else None
+
+            # Chapter at pauses in the audio once its decode (with RMS energy) has finished
+            pauses = None
+            if self.audio_peaks is not None and self.audio_peaks.rms is not None:
+                pauses = self.audio_peaks.pauses()
+            elif self.decode_thread is not None and self.decode_thread.isRunning():
+                # These boundaries are kept by every later run, so don't fall back to transcript-only silently
+                answer = QMessageBox.question(
+                    self, "Audio Still Decoding",
+                    "Chapters can't be cut at pauses in the audio until it has finished decoding.\n\n"
+                    "Chapter from the transcript alone?"
+                )
+                if answer != QMessageBox.StandardButton.Yes:
+                    return
+
             if not self.chappie_processor:
-                self.chappie_processor = ChappieProcessor(api_key)
-            
-            self.processing_thread = ProcessingThread(self.chappie_processor, srt_content)
+                self.chappie_processor = self.create_processor(api_key)
+
+            self.processing_thread = ProcessingThread(self.chappie_processor, srt_content, pauses, previous)
+            self.processing_thread.chapter_ready.connect(self.on_chapter_ready)
             self.processing_thread.finished.connect(self.on_processing_complete)
+            self.processing_thread.cancelled.connect(self.on_processing_cancelled)
             self.processing_thread.error.connect(self.on_processing_error)
-            self.processing_thread.start()
-            
+            self.partial_chapters = {}
+
+            # Indeterminate until the first chapter reports how many there are
             self.progress_dialog = QProgressDialog("Processing chapters...", "Cancel", 0, 0, self)
             self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+            self.progress_dialog.canceled.connect(self.cancel_processing)
             self.progress_dialog.show()
+            self.processing_thread.start()
         except Exception as e:
             logging.exception(f"Error processing chapters: {str(e)}")
             QMessageBox.critical(self, "Error", f"Failed to process chapters: {str(e)}")
 
-    def on_processing_complete(self, result):
+    def on_chapter_ready(self, index, chapter, summary, done, total):
+        # One step per chapter plus a last one for the overall summary, so the bar never closes early
+        self.progress_dialog.setMaximum(total + 1)
+        self.progress_dialog.setValue(done)
+        self.progress_dialog.setLabelText(
+            f"Chapter {index + 1} of {total}: {chapter['title']}" if done < total else "Writing overall summary...")
+        self.partial_chapters[index] = dict(chapter, summary=summary)
+        self.chapter_manager.chapters = [self.partial_chapters[i] for i in sorted(self.partial_chapters)]
+        self.update_chapter_list()
+        self.waveform_widget.set_chapters(self.chapter_manager.chapters)
+        self.chapter_summary.setText(f"Chapter Summary: {summary}")
+
+    def cancel_processing(self):
+        self.processing_thread.cancel()
+        self.statusBar().showMessage("Cancelling...")
+
+    def close_progress_dialog(self):
+        # Closing the dialog emits canceled, which must not cancel a run that already ended
+        self.progress_dialog.canceled.disconnect(self.cancel_processing)
         self.progress_dialog.close()
+
+    def on_processing_cancelled(self):
+        self.close_progress_dialog()
+        # Drop the partial chapters and go back to what was last saved
+        if self.current_audio_path:
+            self.load_saved_chapters(self.current_audio_path)
+        self.statusBar().showMessage("Processing cancelled; finished chapters are cached and won't be requested again.")
+
+    def on_processing_complete(self, result):
+        self.close_progress_dialog()
+        self.export_metrics()
         if 'chapters' in result and 'chapter_summaries' in result and 'overall_summary' in result:
-            self.chapter_manager.chapters = result['chapters']
-            self.update_chapter_list()
-            self.update_table_of_contents()
-            self.chapter_summary.setText(f"Overall Summary: {result['overall_summary']}")
-            for chapter in result['chapters']:
-                self.waveform_widget.add_chapter_region(chapter['start'], chapter['end'])
+            self.show_result(result)
+            audio_path, srt_hash = self.processing_source
+            save_results(audio_path, srt_hash, result, self.chappie_processor.model_name)
+            if audio_path == self.current_audio_path:
+                self.saved_results = {'srt_hash': srt_hash, 'model': self.chappie_processor.model_name,
+                                      'result': result}
+            self.statusBar().clearMessage()
             QMessageBox.information(self, "Processing Complete", "Chapters have been processed successfully.")
         else:
             QMessageBox.warning(self, "Processing Issue", "The chapter processing didn't return the expected results.")
 
     def on_processing_error(self, error_message):
-        self.progress_dialog.close()
+        self.close_progress_dialog()
         QMessageBox.critical(self, "Error", f"Failed to process chapters: {error_message}")
 
     def process_directory(self):
@@ -325,34 +837,89 @@ class ChappieGUI(QMainWindow):
                 QMessageBox.warning(self, "No API Key", "Please set your OpenAI API key in the settings first.")
                 return
 
-            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
             try:
                 if not self.chappie_processor:
-                    self.chappie_processor = ChappieProcessor(api_key)
-                
-                results = self.chappie_processor.process_directory(directory)
-                self.update_table_of_contents(results)
-                QMessageBox.information(self, "Processing Complete", f"Processed {len(results)} files successfully.")
+                    self.chappie_processor = self.create_processor(api_key)
+
+                self.toc_model.clear()
+                self.process_directory_button.setEnabled(False)
+                self.batch_thread = BatchThread(self.chappie_processor, directory,
+                                                int(self.settings.value("batch_workers", 4)), self.search_index)
+                self.batch_thread.file_completed.connect(self.on_batch_file_completed)
+                self.batch_thread.finished.connect(self.on_batch_complete)
+                self.batch_thread.error.connect(self.on_batch_error)
+                self.batch_thread.start()
+                self.statusBar().showMessage("Processing directory...")
             except Exception as e:
                 logging.exception(f"Error processing directory: {str(e)}")
                 QMessageBox.critical(self, "Error", f"Failed to process directory: {str(e)}")
-            finally:
-                QApplication.restoreOverrideCursor()
+
+    def on_batch_file_completed(self, filename, record):
+        if record['status'] == 'ok':
+            self.add_toc_file(filename, record['result'])
+        else:
+            self.toc_model.add_file(filename, [], record.get('error', 'unknown error'))
+
+    def on_batch_complete(self, records):
+        self.process_directory_button.setEnabled(True)
+        self.export_metrics()
+        self.statusBar().clearMessage()
+        failed = [filename for filename, record in records.items() if record['status'] != 'ok']
+        message = f"Processed {len(records) - len(failed)} files successfully."
+        if failed:
+            message += f" {len(failed)} failed and will be retried on the next run."
+        QMessageBox.information(self, "Processing Complete", message)
+
+    def on_batch_error(self, error_message):
+        self.process_directory_button.setEnabled(True)
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Error", f"Failed to process directory: {error_message}")
+
+    def on_started(self):
+        # Runs from the event loop once the window has been shown
+        startup_seconds = time.perf_counter() - STARTUP_STARTED
+        self.metrics.observe("stage_seconds", startup_seconds, stage="startup")
+        logging.info(f"Window shown {startup_seconds:.3f}s after launch")
+        self.export_metrics()
+
+    def export_metrics(self):
+        try:
+            self.metrics.write(os.path.join(default_cache_dir(), "metrics.json"))
+        except Exception as e:
+            logging.exception(f"Error writing metrics: {str(e)}")
+
+    def add_toc_file(self, filename, result):
+        # The summaries list is shared with the result, not copied; rows are created only when expanded
+        return self.toc_model.add_file(filename, result['chapter_summaries'])
 
     def update_table_of_contents(self, results=None):
-        self.toc_tree.clear()
+        self.toc_model.clear()
         if results:
             for filename, result in results.items():
-                file_item = QTreeWidgetItem(self.toc_tree)
-                file_item.setText(0, filename)
-                for i, chapter in enumerate(result['chapters']):
-                    chapter_item = QTreeWidgetItem(file_item)
-                    chapter_item.setText(0, f"Chapter {i+1}: {result['chapter_summaries'][i]}")
+                self.add_toc_file(filename, result)
         elif self.chapter_manager.chapters:
-            for i, chapter in enumerate(self.chapter_manager.chapters):
-                item = QTreeWidgetItem(self.toc_tree)
-                item.setText(0, f"Chapter {i+1}: {chapter.get('title', '')}")
-        self.toc_tree.expandAll()
+            name = os.path.basename(self.current_audio_path) if self.current_audio_path else "Current file"
+            index = self.toc_model.add_file(name, [chapter.get('title', '') for chapter in self.chapter_manager.chapters])
+            self.toc_view.expand(self.toc_proxy.mapFromSource(index))
+
+    def run_search(self):
+        self.search_results.clear()
+        for path, start, snippet in self.search_index.search(self.search_box.text()):
+            item = QListWidgetItem(f"{os.path.basename(path)} [{seconds_to_time(start)}] {snippet}")
+            item.setData(Qt.ItemDataRole.UserRole, (path, start))
+            self.search_results.addItem(item)
+
+    def on_search_result_clicked(self, item):
+        srt_path, start = item.data(Qt.ItemDataRole.UserRole)
+        audio_path = find_sibling_audio(srt_path)
+        if not audio_path:
+            QMessageBox.warning(self, "No Audio File", f"No audio file found for {os.path.basename(srt_path)}.")
+            return
+        if audio_path != self.current_audio_path:
+            self.open_audio_file(audio_path, interactive=False)
+        self.media_player.setPosition(int(start * 1000))
+        self.waveform_widget.update_playhead(start)
+        self.play_audio()
 
     def update_file_status(self):
         status = self.file_manager.files_status()
@@ -368,17 +935,21 @@ class ChappieGUI(QMainWindow):
             start = seconds_to_time(chapter.get('start', 0))
             end = seconds_to_time(chapter.get('end', 0))
             self.chapter_list.addItem(f"{title} ({start} - {end})")
+        self.chapter_index = TimelineIndex([chapter.get('start', 0) for chapter in self.chapter_manager.get_chapters()])
+        self.active_chapter = -1
+        self.sync_active_items(self.media_player.position() / 1000.0)
 
     def play_audio(self):
         self.media_player.play()
         self.play_pause_button.setText("Pause")
-        QTimer.singleShot(100, self.update_playhead)
 
 if __name__ == "__main__":
     try:
+        setup_logging()
         app = QApplication(sys.argv)
         window = ChappieGUI()
         window.show()
+        QTimer.singleShot(0, window.on_started)
         sys.exit(app.exec())
     except Exception as e:
         logging.exception("An error occurred:")
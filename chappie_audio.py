@@ -0,0 +1,312 @@
+# chappie_audio.py
+
+import hashlib
+import json
+import logging
+import os
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from chappie_utils import default_cache_dir
+
+# Bump when the on-disk peak layout changes so old sidecars are ignored
+PEAK_CACHE_VERSION = 2
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+
+
+class PeakPyramid:
+    """
+    Min/max waveform peaks at successively halved resolutions.
+
+    Level 0 holds one (min, max) pair per `base_bin` samples; each following
+    level merges pairs of bins from the previous one, so any view range can be
+    drawn from the coarsest level that still has a bin per screen pixel.
+    `rms` optionally holds the RMS energy of each level-0 bin for pause detection.
+    """
+
+    def __init__(self, levels: List[np.ndarray], sample_rate: int, base_bin: int, duration: float,
+                 rms: Optional[np.ndarray] = None):
+        self.levels = levels
+        self.sample_rate = sample_rate
+        self.base_bin = base_bin
+        self.duration = duration
+        self.rms = rms
+
+    @staticmethod
+    def reduce_block(y: np.ndarray, base_bin: int) -> np.ndarray:
+        """Vectorized min/max of each `base_bin`-sample bin; a short last bin is kept."""
+        if len(y) == 0:
+            return np.empty((0, 2), dtype=np.float32)
+        full = len(y) // base_bin * base_bin
+        peaks = np.empty((0, 2), dtype=np.float32)
+        if full:
+            bins = y[:full].reshape(-1, base_bin)
+            peaks = np.column_stack((bins.min(axis=1), bins.max(axis=1)))
+        if full < len(y):
+            tail = y[full:]
+            peaks = np.vstack((peaks, [[tail.min(), tail.max()]]))
+        return peaks.astype(np.float32, copy=False)
+
+    @staticmethod
+    def reduce_rms(y: np.ndarray, base_bin: int) -> np.ndarray:
+        """RMS energy of each `base_bin`-sample bin, matching reduce_block's bins."""
+        if len(y) == 0:
+            return np.empty(0, dtype=np.float32)
+        full = len(y) // base_bin * base_bin
+        rms = np.empty(0, dtype=np.float32)
+        if full:
+            bins = y[:full].reshape(-1, base_bin).astype(np.float32, copy=False)
+            rms = np.sqrt(np.einsum('ij,ij->i', bins, bins) / base_bin)
+        if full < len(y):
+            tail = y[full:]
+            rms = np.append(rms, np.sqrt(np.mean(tail * tail)))
+        return rms.astype(np.float32, copy=False)
+
+    @classmethod
+    def from_base(cls, base: np.ndarray, sample_rate: int, base_bin: int, duration: float,
+                  rms: Optional[np.ndarray] = None) -> 'PeakPyramid':
+        levels = [base]
+        while len(levels[-1]) > 1024:
+            previous = levels[-1]
+            if len(previous) % 2:
+                previous = np.vstack((previous, previous[-1:]))
+            pairs = previous.reshape(-1, 2, 2)
+            levels.append(np.column_stack((pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1))))
+        return cls(levels, sample_rate, base_bin, duration, rms)
+
+    @classmethod
+    def from_signal(cls, y: np.ndarray, sr: int, base_bin: int = 256) -> 'PeakPyramid':
+        if y.ndim > 1:
+            y = y.mean(axis=0)
+        return cls.from_base(cls.reduce_block(y, base_bin), sr, base_bin, len(y) / sr, cls.reduce_rms(y, base_bin))
+
+    def bin_seconds(self, level: int) -> float:
+        return self.base_bin * (2 ** level) / self.sample_rate
+
+    def level_for(self, x_min: float, x_max: float, max_points: int) -> int:
+        span = max(x_max - x_min, 1e-9)
+        for level in range(len(self.levels)):
+            if span / self.bin_seconds(level) <= max_points:
+                return level
+        return len(self.levels) - 1
+
+    def amplitude_range(self) -> Tuple[float, float]:
+        top = self.levels[-1]
+        if len(top) == 0:
+            return -1.0, 1.0
+        return float(top[:, 0].min()), float(top[:, 1].max())
+
+    def frame_rms(self, frame_seconds: float = 0.05) -> Tuple[np.ndarray, float]:
+        """Merge level-0 RMS bins into frames of roughly `frame_seconds`."""
+        bins_per_frame = max(1, int(round(frame_seconds * self.sample_rate / self.base_bin)))
+        full = len(self.rms) // bins_per_frame * bins_per_frame
+        energy = np.square(self.rms[:full], dtype=np.float64).reshape(-1, bins_per_frame).mean(axis=1)
+        return np.sqrt(energy), bins_per_frame * self.base_bin / self.sample_rate
+
+    def pauses(self, **kwargs) -> np.ndarray:
+        if self.rms is None:
+            return np.empty((0, 2))
+        rms, frame_seconds = self.frame_rms()
+        return detect_pauses(rms, frame_seconds, **kwargs)
+
+    def window(self, x_min: float, x_max: float, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Envelope of the visible range at the right level of detail.
+
+        :return: (times, values) with min and max of each bin interleaved, ready for a connected curve
+        """
+        level = self.level_for(x_min, x_max, max_points)
+        peaks = self.levels[level]
+        bin_seconds = self.bin_seconds(level)
+        first = max(0, int(np.floor(x_min / bin_seconds)) - 1)
+        last = min(len(peaks), int(np.ceil(x_max / bin_seconds)) + 1)
+        if last <= first:
+            return np.empty(0), np.empty(0)
+        centers = (np.arange(first, last) + 0.5) * bin_seconds
+        return np.repeat(centers, 2), peaks[first:last].ravel()
+
+
+class PeakBuilder:
+    """
+    Reduce a stream of audio blocks to a PeakPyramid without holding the signal.
+
+    Each block is folded into level-0 peaks as it arrives and the coarser levels
+    are extended incrementally, so memory stays proportional to the peaks only.
+    """
+
+    def __init__(self, sample_rate: int, total_frames: int = 0, base_bin: int = 256):
+        self.sample_rate = sample_rate
+        self.total_frames = total_frames
+        self.base_bin = base_bin
+        self.samples = 0
+        self.remainder = np.empty(0, dtype=np.float32)
+        self.level_chunks = []
+        self.level_carry = []
+        self.rms_chunks = []
+
+    def _append(self, level: int, peaks: np.ndarray):
+        if level == len(self.level_chunks):
+            self.level_chunks.append([])
+            self.level_carry.append(np.empty((0, 2), dtype=np.float32))
+        self.level_chunks[level].append(peaks)
+        peaks = np.vstack((self.level_carry[level], peaks))
+        even = len(peaks) // 2 * 2
+        self.level_carry[level] = peaks[even:]
+        if even:
+            pairs = peaks[:even].reshape(-1, 2, 2)
+            self._append(level + 1, np.column_stack((pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1))))
+
+    def add(self, block: np.ndarray):
+        if block.ndim > 1:
+            block = block.mean(axis=1)
+        self.samples += len(block)
+        data = np.concatenate((self.remainder, block.astype(np.float32, copy=False)))
+        full = len(data) // self.base_bin * self.base_bin
+        self.remainder = data[full:]
+        if full:
+            self._append(0, PeakPyramid.reduce_block(data[:full], self.base_bin))
+            self.rms_chunks.append(PeakPyramid.reduce_rms(data[:full], self.base_bin))
+
+    def partial(self) -> PeakPyramid:
+        """Pyramid of everything decoded so far, spanning the full expected duration."""
+        levels = []
+        for chunks in self.level_chunks:
+            if len(chunks) > 1:
+                chunks[:] = [np.concatenate(chunks)]
+            levels.append(chunks[0])
+        if not levels:
+            levels = [np.empty((0, 2), dtype=np.float32)]
+        duration = max(self.total_frames, self.samples) / self.sample_rate
+        return PeakPyramid(levels, self.sample_rate, self.base_bin, duration)
+
+    def finish(self) -> PeakPyramid:
+        chunks = [np.concatenate(self.level_chunks[0])] if self.level_chunks else []
+        chunks.append(PeakPyramid.reduce_block(self.remainder, self.base_bin))
+        rms = np.concatenate(self.rms_chunks + [PeakPyramid.reduce_rms(self.remainder, self.base_bin)])
+        return PeakPyramid.from_base(np.concatenate(chunks), self.sample_rate, self.base_bin,
+                                     self.samples / self.sample_rate, rms)
+
+
+def detect_pauses(rms: np.ndarray, frame_seconds: float, min_pause: float = 0.3,
+                  threshold_db: float = -30.0) -> np.ndarray:
+    """
+    Find runs of quiet frames.
+
+    A frame is quiet when it is `threshold_db` below the loud (95th percentile)
+    level of the recording, which adapts to the overall gain of the file.
+
+    :return: Array of (start, end) seconds, one row per pause of at least `min_pause`
+    """
+    if len(rms) == 0:
+        return np.empty((0, 2))
+    reference = max(float(np.percentile(rms, 95)), 1e-9)
+    quiet = 20 * np.log10(np.maximum(rms, 1e-12) / reference) < threshold_db
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) * frame_seconds >= min_pause
+    return np.column_stack((starts[keep], ends[keep])) * frame_seconds
+
+
+def open_audio_blocks(path: str, block_frames: int = 1 << 18) -> Tuple[int, int, Iterator[np.ndarray]]:
+    """
+    Open `path` for block-wise mono decoding.
+
+    :return: (sample_rate, total_frames, iterator of float32 blocks)
+    """
+    import soundfile as sf
+    try:
+        sound_file = sf.SoundFile(path)
+    except RuntimeError:
+        # Formats libsndfile cannot read still go through librosa, in one piece
+        import librosa
+        y, sr = librosa.load(path, sr=None)
+        return sr, len(y), (y[i:i + block_frames] for i in range(0, len(y), block_frames))
+
+    def blocks():
+        with sound_file:
+            for block in sound_file.blocks(blocksize=block_frames, dtype='float32', always_2d=True):
+                yield block.mean(axis=1)
+
+    return sound_file.samplerate, sound_file.frames, blocks()
+
+
+def peak_cache_paths(audio_path: str, cache_dir: Optional[str] = None) -> Tuple[str, str]:
+    cache_dir = cache_dir or os.path.join(default_cache_dir(), "peaks")
+    key = hashlib.sha1(os.path.abspath(audio_path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{key}.npy"), os.path.join(cache_dir, f"{key}.json")
+
+def _audio_signature(audio_path: str) -> dict:
+    stat = os.stat(audio_path)
+    return {'version': PEAK_CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def load_cached_peaks(audio_path: str, cache_dir: Optional[str] = None) -> Optional[PeakPyramid]:
+    """
+    Memory-map the peak sidecar for `audio_path` if it is still valid.
+
+    Sidecars written for another version, size or mtime are deleted.
+    """
+    data_path, meta_path = peak_cache_paths(audio_path, cache_dir)
+    rms_path = data_path[:-len(".npy")] + ".rms.npy"
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+    if any(meta.get(key) != value for key, value in _audio_signature(audio_path).items()):
+        for path in (data_path, meta_path, rms_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+    try:
+        data = np.load(data_path, mmap_mode='r')
+        rms = np.load(rms_path, mmap_mode='r') if meta.get('has_rms') else None
+    except (OSError, ValueError):
+        return None
+    offsets = meta['offsets']
+    levels = [data[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    return PeakPyramid(levels, meta['sample_rate'], meta['base_bin'], meta['duration'], rms)
+
+def save_cached_peaks(audio_path: str, peaks: PeakPyramid, cache_dir: Optional[str] = None):
+    data_path, meta_path = peak_cache_paths(audio_path, cache_dir)
+    rms_path = data_path[:-len(".npy")] + ".rms.npy"
+    try:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        offsets = np.cumsum([0] + [len(level) for level in peaks.levels]).tolist()
+        meta = dict(_audio_signature(audio_path), offsets=offsets, sample_rate=peaks.sample_rate,
+                    base_bin=peaks.base_bin, duration=peaks.duration, has_rms=peaks.rms is not None)
+        # Write the data first and the metadata last, each via rename, so readers never see a torn entry
+        with open(data_path + ".tmp", 'wb') as data_file:
+            np.save(data_file, np.concatenate(peaks.levels).astype(np.float32, copy=False))
+        os.replace(data_path + ".tmp", data_path)
+        if peaks.rms is not None:
+            with open(rms_path + ".tmp", 'wb') as rms_file:
+                np.save(rms_file, np.asarray(peaks.rms, dtype=np.float32))
+            os.replace(rms_path + ".tmp", rms_path)
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(meta_path + ".tmp", meta_path)
+    except OSError as e:
+        logging.warning(f"Could not write peak cache for {audio_path}: {e}")
+
+def decode_peaks(audio_path: str, cache_dir: Optional[str] = None) -> PeakPyramid:
+    """Peaks for `audio_path` from the sidecar cache, decoding block-wise on a miss."""
+    peaks = load_cached_peaks(audio_path, cache_dir)
+    if peaks is None:
+        sample_rate, total_frames, blocks = open_audio_blocks(audio_path)
+        builder = PeakBuilder(sample_rate, total_frames)
+        for block in blocks:
+            builder.add(block)
+        peaks = builder.finish()
+        save_cached_peaks(audio_path, peaks, cache_dir)
+    return peaks
+
+def find_sibling_audio(srt_path: str) -> Optional[str]:
+    """Audio file an SRT belongs to, following FileManager's `<name>_transcript.srt` convention."""
+    base = os.path.splitext(srt_path)[0]
+    candidates = [base[:-len("_transcript")]] if base.endswith("_transcript") else []
+    candidates.append(base)
+    for candidate in candidates:
+        for extension in AUDIO_EXTENSIONS:
+            if os.path.exists(candidate + extension):
+                return candidate + extension
+    return None
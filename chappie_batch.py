@@ -0,0 +1,192 @@
+# chappie_batch.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from chappie_audio import decode_peaks, find_sibling_audio
+from chappie_utils import SrtCues
+
+MANIFEST_NAME = ".chappie_manifest.jsonl"
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def strip_chapter_text(record: Dict[str, any]) -> Dict[str, any]:
+    """The record as stored in the manifest: chapter text is left out, its hash is enough for reuse."""
+    if 'result' not in record:
+        return record
+    chapters = [{key: value for key, value in chapter.items() if key != 'text'}
+                for chapter in record['result']['chapters']]
+    return dict(record, result=dict(record['result'], chapters=chapters))
+
+
+def restore_chapter_text(result: Dict[str, any], srt_content: str) -> Dict[str, any]:
+    """Re-cut the chapter text of a stored result from its (unchanged) transcript."""
+    cues = SrtCues.from_srt(srt_content)
+    bounds = np.searchsorted(cues.starts, [chapter['start'] for chapter in result['chapters']]).tolist()
+    chapters = [dict(chapter, text=cues.span_text(first, last))
+                for chapter, first, last in zip(result['chapters'], bounds, bounds[1:] + [len(cues)])]
+    return dict(result, chapters=chapters)
+
+
+class BatchProcessor:
+    """
+    Process many SRT files concurrently with a resumable JSONL manifest.
+
+    Every finished file is appended to the manifest straight away, so a crashed
+    or cancelled batch resumes where it stopped; files whose content hash is
+    unchanged since their last successful run are skipped. Records are stored
+    without chapter text, which is re-cut from the transcript when a file is skipped.
+    """
+
+    def __init__(self, processor, workers: int = 4, manifest_path: Optional[str] = None,
+                 use_audio: bool = False, search_index=None):
+        self.processor = processor
+        self.workers = workers
+        self.manifest_path = manifest_path
+        # Chapter at pauses in the transcript's sibling audio file when there is one
+        self.use_audio = use_audio
+        # Optional TranscriptIndex kept up to date with every file the batch sees
+        self.search_index = search_index
+        # This batch's own cancel token: stops queued files and the LLM calls of files in flight,
+        # without touching other runs that share the processor
+        self.stop_event = threading.Event()
+
+    def cancel(self):
+        self.stop_event.set()
+
+    def load_manifest(self) -> Dict[str, Dict[str, any]]:
+        records = {}
+        if not self.manifest_path or not os.path.exists(self.manifest_path):
+            return records
+        with open(self.manifest_path, 'r', encoding='utf-8') as manifest:
+            for line in manifest:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash mid-write can leave a torn last line
+                    continue
+                records[record['file']] = record
+        return records
+
+    def _write_manifest(self, records: Dict[str, Dict[str, any]]):
+        # Compact to one line per file so the append log doesn't grow forever
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as manifest:
+            for record in records.values():
+                manifest.write(json.dumps(strip_chapter_text(record), ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.manifest_path)
+
+    def key_for(self, path: str) -> str:
+        if not self.manifest_path:
+            return os.path.basename(path)
+        # Files next to the manifest keep short keys; anything elsewhere is keyed by absolute path
+        manifest_dir = os.path.dirname(os.path.abspath(self.manifest_path))
+        path = os.path.abspath(path)
+        if os.path.commonpath([manifest_dir, path]) == manifest_dir:
+            return os.path.relpath(path, manifest_dir)
+        return path
+
+    def _process_file(self, path: str, previous: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+        if self.stop_event.is_set():
+            return None
+        record = {'file': self.key_for(path), 'hash': None}
+        metrics = getattr(self.processor, 'metrics', None)
+        started = time.perf_counter()
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                srt_content = file.read()
+            record['hash'] = content_hash(srt_content)
+            if self.search_index:
+                self.search_index.index_file(path, srt_content)
+            pauses = None
+            audio_path = find_sibling_audio(path) if self.use_audio else None
+            if audio_path:
+                audio_started = time.perf_counter()
+                pauses = decode_peaks(audio_path).pauses()
+                if metrics:
+                    metrics.observe("stage_seconds", time.perf_counter() - audio_started, stage="audio_decode")
+            # An edited transcript only regenerates the chapters whose text changed
+            record['result'] = self.processor.process_srt(srt_content, pauses, previous,
+                                                          cancel_event=self.stop_event)
+            record['status'] = 'ok'
+        except CancelledError:
+            # Left out of the manifest so the next run picks the file up again
+            return None
+        except Exception as e:
+            logging.exception(f"Error processing {path}: {str(e)}")
+            record['status'] = 'error'
+            record['error'] = str(e)
+        if metrics:
+            metrics.observe("stage_seconds", time.perf_counter() - started, stage="file")
+            metrics.inc("files_total", status=record['status'])
+        return record
+
+    def run(self, paths: List[str],
+            on_result: Optional[Callable[[str, Dict[str, any]], None]] = None) -> Dict[str, Dict[str, any]]:
+        """
+        Process `paths`, calling on_result(key, record) as each file completes.
+
+        :return: Manifest records keyed by file, including skipped and failed files
+        """
+        self.stop_event.clear()
+        records = self.load_manifest()
+        keys = [self.key_for(path) for path in paths]
+        pending = []
+        for path, key in zip(paths, keys):
+            previous = records.get(key)
+            if previous and previous.get('status') == 'ok':
+                with open(path, 'r', encoding='utf-8', errors='replace') as file:
+                    srt_content = file.read()
+                if content_hash(srt_content) == previous['hash']:
+                    if self.search_index:
+                        self.search_index.index_file(path, srt_content)
+                    records[key] = dict(previous, result=restore_chapter_text(previous['result'], srt_content))
+                    if on_result:
+                        on_result(key, records[key])
+                    continue
+            pending.append((path, previous['result'] if previous and previous.get('status') == 'ok' else None))
+
+        manifest = open(self.manifest_path, 'a', encoding='utf-8') if self.manifest_path else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="chappie-batch") as pool:
+                futures = [pool.submit(self._process_file, path, previous) for path, previous in pending]
+                try:
+                    for future in as_completed(futures):
+                        record = future.result()
+                        if record is None:
+                            continue
+                        records[record['file']] = record
+                        if manifest:
+                            manifest.write(json.dumps(strip_chapter_text(record), ensure_ascii=False) + "\n")
+                            manifest.flush()
+                        if on_result:
+                            on_result(record['file'], record)
+                except BaseException:
+                    # e.g. Ctrl-C: skip the queued files and abort the LLM calls of those in flight,
+                    # so the pool drains without waiting on their requests
+                    self.cancel()
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            if manifest:
+                manifest.close()
+                self._write_manifest(records)
+        return {key: records[key] for key in keys if key in records}
+
+    def process_directory(self, directory_path: str,
+                          on_result: Optional[Callable[[str, Dict[str, any]], None]] = None) -> Dict[str, Dict[str, any]]:
+        if self.manifest_path is None:
+            self.manifest_path = os.path.join(directory_path, MANIFEST_NAME)
+        paths = sorted(os.path.join(directory_path, filename)
+                       for filename in os.listdir(directory_path) if filename.endswith(".srt"))
+        return self.run(paths, on_result)
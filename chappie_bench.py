@@ -0,0 +1,332 @@
+# chappie_bench.py
+#
+# Benchmarks for the processing pipeline. LLM stages run against a local fake chat model,
+# so no API key or network is needed:
+#
+#   python chappie_bench.py --save-baseline bench_baseline.json
+#   python chappie_bench.py --baseline bench_baseline.json
+
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+from chappie_audio import PeakPyramid
+from chappie_utils import SrtCues, parse_srt, seconds_to_srt_time, time_to_seconds, times_to_seconds
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+WORDS = ("the quick brown fox jumps over a lazy dog while we talk about audio chapters "
+         "and summaries for another episode of the show").split()
+
+
+class FakeAPIError(Exception):
+    """Stands in for a 429 from the API, so the executor's retry path is exercised."""
+    status_code = 429
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Local chat model with configurable latency and failure rate that counts its requests.
+
+    Replies are short and deterministic per prompt; prompts asking for a JSON
+    title/summary get one.
+    """
+    latency: float = 0.05
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    seed: int = 0
+    model_name: str = "chappie-fake"
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _random: random.Random = PrivateAttr(default=None)
+    _requests: int = PrivateAttr(default=0)
+    _failures: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "chappie-fake"
+
+    @property
+    def requests(self) -> int:
+        return self._requests
+
+    @property
+    def failures(self) -> int:
+        return self._failures
+
+    def reset_counts(self):
+        with self._lock:
+            self._requests = 0
+            self._failures = 0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        with self._lock:
+            if self._random is None:
+                self._random = random.Random(self.seed)
+            self._requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self._failures += 1
+        time.sleep(delay)
+        if fail:
+            raise FakeAPIError("fake rate limit")
+        prompt = messages[-1].content
+        words = prompt.split()[-12:]
+        if '"title"' in prompt:
+            reply = json.dumps({'title': " ".join(words[:4]), 'summary': " ".join(words)})
+        else:
+            reply = " ".join(words)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+
+def synthetic_srt(n_cues: int, seed: int = 0, cue_seconds: float = 3.0) -> str:
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(n_cues):
+        start = i * cue_seconds
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14)))
+        blocks.append(f"{i + 1}\n{seconds_to_srt_time(start)} --> {seconds_to_srt_time(start + cue_seconds - 0.2)}\n"
+                      f"{text}\n")
+    return "\n".join(blocks)
+
+
+def measure(fn: Callable[[], any], repeat: int = 1, memory: bool = True) -> Dict[str, float]:
+    """
+    Best-of-`repeat` wall time, then peak traced memory from one more run.
+
+    Memory is traced separately because tracemalloc slows the timed code down several times.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    result = {'seconds': best}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def make_processor(llm: FakeChatModel, **kwargs):
+    from chappie_processor import ChappieProcessor
+    processor = ChappieProcessor(None, llm=llm, use_cache=False, **kwargs)
+    # Fake failures are instant, so don't wait out real-world backoff delays
+    processor.executor.base_delay = 0.01
+    processor.executor.max_delay = 0.1
+    return processor
+
+
+def bench_parsing(sizes: List[int], repeat: int, memory: bool) -> List[Dict[str, any]]:
+    results = []
+    for n in sizes:
+        content = synthetic_srt(n)
+        times = [line.split(" --> ")[0] for line in content.splitlines() if " --> " in line]
+        for name, fn in [
+            ("parse_srt", lambda: parse_srt(content)),
+            ("SrtCues.from_srt", lambda: SrtCues.from_srt(content)),
+            ("time_to_seconds", lambda: [time_to_seconds(t) for t in times]),
+            ("times_to_seconds", lambda: times_to_seconds(times)),
+        ]:
+            results.append(dict(measure(fn, repeat, memory), name=f"{name}[{n}]", items=n))
+    return results
+
+
+def bench_chaptering(sizes: List[int], repeat: int, memory: bool) -> List[Dict[str, any]]:
+    results = []
+    processor = make_processor(FakeChatModel())
+    for n in sizes:
+        cues = SrtCues.from_srt(synthetic_srt(n))
+        processor.token_counter.cue_counts(cues)  # tokenize once, as process_srt's stages share it
+        pauses = np.array([[start + 2.8, start + 3.2] for start in cues.starts[::7].tolist()])
+        results.append(dict(measure(lambda: processor._generate_chapters(cues), repeat, memory),
+                            name=f"chapters_by_tokens[{n}]", items=n))
+        results.append(dict(measure(lambda: processor._generate_chapters(cues, pauses), repeat, memory),
+                            name=f"chapters_by_pauses[{n}]", items=n))
+    processor.executor.shutdown()
+    return results
+
+
+def bench_decimation(minutes: List[int], repeat: int, memory: bool, width: int = 1000) -> List[Dict[str, any]]:
+    results = []
+    sr = 22050
+    for m in minutes:
+        y = np.random.default_rng(0).standard_normal(sr * 60 * m).astype(np.float32)
+        duration = len(y) / sr
+
+        def stride():
+            # What plot_waveform used to do: keep every n-th sample of the whole signal
+            factor = max(1, len(y) // 10000)
+            return y[::factor], (np.arange(0, len(y)) / sr)[::factor]
+
+        pyramid = PeakPyramid.from_signal(y, sr)
+
+        def zoom_sweep():
+            # One redraw per zoom step, from the full file down to a few seconds
+            span = duration
+            while span > 5:
+                pyramid.window(duration / 2 - span / 2, duration / 2 + span / 2, width)
+                span /= 2
+
+        results.append(dict(measure(stride, repeat, memory), name=f"decimate_stride[{m}min]", items=len(y)))
+        results.append(dict(measure(lambda: PeakPyramid.from_signal(y, sr), repeat, memory),
+                            name=f"decimate_pyramid_build[{m}min]", items=len(y)))
+        results.append(dict(measure(zoom_sweep, repeat, memory), name=f"decimate_pyramid_zoom[{m}min]", items=len(y)))
+    return results
+
+
+def bench_end_to_end(args) -> List[Dict[str, any]]:
+    results = []
+    llm = FakeChatModel(latency=args.latency, jitter=args.latency / 2, failure_rate=args.failure_rate)
+    content = synthetic_srt(args.e2e_cues)
+    for combined in (False, True):
+        processor = make_processor(llm, max_concurrency=args.concurrency, combined_mode=combined)
+        llm.reset_counts()
+        # LLM-bound and nondeterministic under failures: one run, no repeat
+        result = measure(lambda: processor.process_srt(content), 1, args.memory)
+        results.append(dict(result, name=f"process_srt[{args.e2e_cues}{',combined' if combined else ''}]",
+                            items=args.e2e_cues, requests=llm.requests, failures=llm.failures))
+        processor.executor.shutdown()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(args.e2e_files):
+            with open(os.path.join(directory, f"episode{i:03d}.srt"), 'w', encoding='utf-8') as file:
+                file.write(synthetic_srt(args.e2e_cues, seed=i))
+        processor = make_processor(llm, max_concurrency=args.concurrency)
+        llm.reset_counts()
+
+        def run_directory():
+            # A fresh manifest every time, or the second run would skip every file
+            manifest = os.path.join(directory, ".chappie_manifest.jsonl")
+            if os.path.exists(manifest):
+                os.remove(manifest)
+            processor.process_directory(directory, workers=args.workers)
+
+        result = measure(run_directory, 1, False)
+        results.append(dict(result, name=f"process_directory[{args.e2e_files}x{args.e2e_cues}]",
+                            items=args.e2e_files * args.e2e_cues, requests=llm.requests, failures=llm.failures))
+        processor.executor.shutdown()
+    return results
+
+
+def bench_imports(modules: List[str], repeat: int) -> List[Dict[str, any]]:
+    """Cold import time of each module in a fresh interpreter, the floor for app and CLI startup."""
+    results = []
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in modules:
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        best = float('inf')
+        for _ in range(repeat):
+            completed = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True)
+            if completed.returncode != 0:
+                break
+            best = min(best, float(completed.stdout.strip().splitlines()[-1]))
+        if best != float('inf'):
+            results.append({'name': f"import_{module}", 'seconds': best, 'items': 1})
+    return results
+
+
+def compare(results: List[Dict[str, any]], baseline: Dict[str, Dict[str, any]], tolerance: float) -> List[str]:
+    """:return: Names of benchmarks slower than the baseline by more than `tolerance`"""
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['name'])
+        if not previous:
+            result['vs_baseline'] = None
+            continue
+        ratio = result['seconds'] / previous['seconds'] if previous['seconds'] else 1.0
+        result['vs_baseline'] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(result['name'])
+    return regressions
+
+
+def print_table(results: List[Dict[str, any]]):
+    print(f"{'benchmark':44} {'seconds':>9} {'items/s':>12} {'peak MB':>9} {'requests':>9} {'vs base':>8}")
+    for result in results:
+        throughput = result['items'] / result['seconds'] if result['seconds'] else float('inf')
+        peak = f"{result['peak_mb']:.1f}" if 'peak_mb' in result else "-"
+        requests = f"{result['requests']}/{result['failures']}" if 'requests' in result else "-"
+        ratio = f"{result['vs_baseline']:.2f}x" if result.get('vs_baseline') else "-"
+        print(f"{result['name']:44} {result['seconds']:9.4f} {throughput:12,.0f} {peak:>9} {requests:>9} {ratio:>8}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark Chappie's parsing, chaptering, waveform and LLM pipeline.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated cue counts for parsing and chaptering (e.g. 1000,1000000)")
+    parser.add_argument("--audio-minutes", default="10,60", help="comma-separated audio lengths for decimation")
+    parser.add_argument("--only", choices=["startup", "parsing", "chaptering", "decimation", "e2e"], action="append",
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark; the best is reported")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip peak-memory measurement")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per request in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="fraction of fake requests failing with 429")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum fake LLM requests in flight")
+    parser.add_argument("--workers", type=int, default=4, help="files processed concurrently by process_directory")
+    parser.add_argument("--e2e-cues", type=int, default=500, help="cues per transcript in end-to-end runs")
+    parser.add_argument("--e2e-files", type=int, default=8, help="transcripts in the process_directory run")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    parser.add_argument("--save-baseline", default=None, help="write the results as a baseline to this file")
+    parser.add_argument("--baseline", default=None, help="compare against a baseline written by --save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="slowdown vs. the baseline reported as a regression (0.10 = 10%%)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    minutes = [int(m) for m in args.audio_minutes.split(",") if m]
+    groups = args.only or ["startup", "parsing", "chaptering", "decimation", "e2e"]
+
+    results = []
+    if "startup" in groups:
+        # chappie needs a display and Qt multimedia; it is skipped where it cannot be imported
+        results += bench_imports(["chappie_processor", "chappie_cli", "chappie"], args.repeat)
+    if "parsing" in groups:
+        results += bench_parsing(sizes, args.repeat, args.memory)
+    if "chaptering" in groups:
+        results += bench_chaptering(sizes, args.repeat, args.memory)
+    if "decimation" in groups:
+        results += bench_decimation(minutes, args.repeat, args.memory)
+    if "e2e" in groups:
+        results += bench_end_to_end(args)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = {result['name']: result for result in json.load(file)['results']}
+        regressions = compare(results, baseline, args.tolerance)
+    print_table(results)
+
+    report = {'python': sys.version.split()[0], 'created': time.time(), 'results': results}
+    for path in filter(None, [args.json, args.save_baseline]):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    if regressions:
+        print(f"Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
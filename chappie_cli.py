@@ -0,0 +1,179 @@
+# chappie_cli.py
+#
+# Headless batch entry point. Imports nothing from Qt, so it runs on servers and from cron:
+#
+#   python chappie_cli.py "podcasts/**/*.srt" --workers 8 --format jsonl -o chapters.jsonl
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+from chappie_logging import quiet_libraries
+from chappie_utils import default_cache_dir, seconds_to_srt_time
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+
+
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.srt")
+        paths.extend(glob.glob(pattern, recursive=True))
+    # De-duplicate overlapping patterns, in a stable order
+    return sorted(set(os.path.abspath(path) for path in paths))
+
+
+def chapters_to_srt(result):
+    blocks = []
+    for i, chapter in enumerate(result['chapters']):
+        summary = result['chapter_summaries'][i] if i < len(result['chapter_summaries']) else ""
+        blocks.append(
+            f"{i + 1}\n{seconds_to_srt_time(chapter['start'])} --> {seconds_to_srt_time(chapter['end'])}\n"
+            f"{chapter['title']}\n{summary}\n"
+        )
+    return "\n".join(blocks)
+
+
+def output_path(input_path, output_dir, extension, root=None):
+    """Next to the input, or under `output_dir` at the input's path relative to `root`."""
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    directory = os.path.dirname(input_path)
+    if output_dir:
+        # Mirror the input folders, so podcasts/a/episode1.srt and podcasts/b/episode1.srt don't collide
+        directory = os.path.join(output_dir, os.path.relpath(directory, root or directory))
+    return os.path.normpath(os.path.join(directory, f"{base}.chapters.{extension}"))
+
+
+def output_paths(paths, output_dir, extension):
+    """:return: {input path: output path}, or None if two inputs would write the same output"""
+    root = os.path.commonpath([os.path.dirname(path) for path in paths]) if output_dir else None
+    outputs = {path: output_path(path, output_dir, extension, root) for path in paths}
+    return outputs if len(set(outputs.values())) == len(outputs) else None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate chapters, titles and summaries for SRT transcripts.")
+    parser.add_argument("inputs", nargs="+", help="SRT files, directories or glob patterns (** is recursive)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="files processed concurrently")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum LLM requests in flight")
+    parser.add_argument("--rpm", type=int, default=None, help="requests-per-minute limit")
+    parser.add_argument("--tpm", type=int, default=None, help="tokens-per-minute limit")
+    parser.add_argument("--cache-dir", default=None, help="directory for the response cache and manifest")
+    parser.add_argument("--no-cache", action="store_true", help="always request fresh generations")
+    parser.add_argument("-f", "--format", choices=["json", "jsonl", "srt"], default="json",
+                        help="json/srt: one file per input; jsonl: one line per input")
+    parser.add_argument("-o", "--output", default=None,
+                        help="output directory (json/srt, default: next to each input; keeps the inputs' "
+                             "subfolders) or file (jsonl, default: stdout)")
+    parser.add_argument("--audio-boundaries", action="store_true",
+                        help="cut chapters at pauses in each transcript's sibling audio file")
+    parser.add_argument("--model", default="gpt-3.5-turbo-16k", help="chat model; sets the per-call token budget")
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false",
+                        help="don't reuse titles and summaries of near-duplicate chapters (intros, ad reads) "
+                             "across files; implied by --no-cache")
+    parser.add_argument("--combined", action="store_true", help="request title and summary in one call per chapter")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"),
+                        help="OpenAI API key (default: $OPENAI_API_KEY)")
+    parser.add_argument("--metrics", default=None,
+                        help="write run metrics here after the batch: Prometheus text for *.prom, JSON otherwise")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    quiet_libraries()
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("No SRT files matched the given inputs.", file=sys.stderr)
+        return EXIT_USAGE
+    if not args.api_key:
+        print("No API key: pass --api-key or set OPENAI_API_KEY.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.workers < 1 or args.concurrency < 1:
+        print("--workers and --concurrency must be at least 1.", file=sys.stderr)
+        return EXIT_USAGE
+    outputs = None
+    if args.format != "jsonl":
+        outputs = output_paths(paths, args.output, args.format)
+        if outputs is None:
+            print("Several inputs would write the same output file (same name, different extension).",
+                  file=sys.stderr)
+            return EXIT_USAGE
+
+    # Deferred so --help and usage errors return without loading the LLM stack
+    from chappie_batch import BatchProcessor
+    from chappie_dedup import DedupStore
+    from chappie_processor import ChappieProcessor
+
+    cache_dir = args.cache_dir or default_cache_dir()
+    # The manifest lives here even with --no-cache, and a fresh host has no ~/.chappie yet
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        print(f"Cannot create cache directory {cache_dir}: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    processor = ChappieProcessor(
+        args.api_key,
+        max_concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        combined_mode=args.combined,
+        model_name=args.model,
+        use_cache=not args.no_cache,
+        cache_path=os.path.join(cache_dir, "llm_cache.sqlite"),
+        # Reusing a near-duplicate's summary isn't a fresh generation, so --no-cache turns it off too
+        dedup=DedupStore(os.path.join(cache_dir, "dedup.sqlite")) if args.dedup and not args.no_cache else None
+    )
+    batch = BatchProcessor(processor, args.workers, os.path.join(cache_dir, "manifest.jsonl"),
+                           use_audio=args.audio_boundaries)
+
+    jsonl_file = None
+    if args.format == "jsonl":
+        jsonl_file = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    keys_to_paths = {batch.key_for(path): path for path in paths}
+
+    def on_result(key, record):
+        path = keys_to_paths.get(key, key)
+        if args.format == "jsonl":
+            jsonl_file.write(json.dumps(dict(record, file=path), ensure_ascii=False) + "\n")
+            jsonl_file.flush()
+        elif record['status'] == 'ok':
+            out_path = outputs[path]
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            with open(out_path, 'w', encoding='utf-8') as out:
+                if args.format == "json":
+                    json.dump(record['result'], out, ensure_ascii=False, indent=2)
+                else:
+                    out.write(chapters_to_srt(record['result']))
+        if record['status'] != 'ok':
+            print(f"{path}: {record.get('error', 'failed')}", file=sys.stderr)
+
+    try:
+        records = batch.run(paths, on_result)
+    except KeyboardInterrupt:
+        # run() has already cancelled the batch, including its in-flight requests, before draining
+        return 130
+    finally:
+        if jsonl_file is not None and jsonl_file is not sys.stdout:
+            jsonl_file.close()
+        processor.executor.shutdown()
+        if args.metrics:
+            processor.metrics.write(args.metrics)
+
+    failed = sum(1 for record in records.values() if record['status'] != 'ok')
+    logging.info(f"Processed {len(records) - failed} of {len(records)} files")
+    return EXIT_FAILURES if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
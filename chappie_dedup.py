@@ -0,0 +1,175 @@
+# chappie_dedup.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Optional, Tuple
+import numpy as np
+from chappie_utils import default_cache_dir
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase words without punctuation, so transcription noise doesn't break matches."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class MinHasher:
+    """MinHash signatures over word shingles; matching signature slots estimate Jaccard similarity."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # Fixed seed: signatures are persisted, so the permutations must never change between runs
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, int(MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(MERSENNE_PRIME), num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = normalize(text).split()
+        k = self.shingle_size
+        grams = [" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))] if words else []
+        return np.unique(np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams),
+                                     dtype=np.uint64, count=len(grams)))
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = self.shingles(text)
+        if not len(hashes):
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        # Universal hashing (a*x + b) mod p per permutation; uint64 products wrap, as in datasketch
+        values = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return values.min(axis=0).astype(np.uint32)
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    return float(np.mean(first == second))
+
+
+class DedupStore:
+    """
+    Persistent MinHash/LSH index of summarized segments.
+
+    Segments whose estimated Jaccard similarity to a stored one reaches
+    `threshold` reuse its title and summary. LSH banding keeps lookups to a few
+    indexed bucket reads instead of a scan of every stored signature.
+
+    A segment being summarized right now is claimed, so a concurrent file
+    with the same segment waits for that result instead of paying for it again.
+    The store may be shared by several processes (the GUI and CLI batches), so
+    only claims older than `claim_timeout` seconds are treated as abandoned.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.8, num_perm: int = 128,
+                 bands: int = 16, min_words: int = 20, claim_timeout: float = 3600.0):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        path = path or os.path.join(default_cache_dir(), "dedup.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.hasher = MinHasher(num_perm)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Short segments (greetings, "thanks for listening") match too easily to be trusted
+        self.min_words = min_words
+        self.claims = {}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments (id INTEGER PRIMARY KEY, model TEXT, signature BLOB NOT NULL, "
+                "title TEXT, summary TEXT, created REAL)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket INTEGER, segment_id INTEGER)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, bucket)")
+            # Claims left behind by a crashed run will never be completed; newer ones may belong to a live process
+            stale = time.time() - claim_timeout
+            self.conn.execute("DELETE FROM bands WHERE segment_id IN "
+                              "(SELECT id FROM segments WHERE title IS NULL AND created < ?)", (stale,))
+            self.conn.execute("DELETE FROM segments WHERE title IS NULL AND created < ?", (stale,))
+
+    def _buckets(self, signature: np.ndarray):
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            yield band, int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'big', signed=True)
+
+    def _best_match(self, model: str, signature: np.ndarray):
+        candidates = set()
+        for band, bucket in self._buckets(signature):
+            candidates.update(row[0] for row in self.conn.execute(
+                "SELECT segment_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)))
+        best, best_score = None, self.threshold
+        for segment_id in candidates:
+            row = self.conn.execute(
+                "SELECT signature, title, summary FROM segments WHERE id = ? AND model IS ?", (segment_id, model)
+            ).fetchone()
+            if row is None:
+                continue
+            score = similarity(signature, np.frombuffer(row[0], dtype=np.uint32))
+            if score >= best_score:
+                best, best_score = (segment_id, row[1], row[2]), score
+        return best
+
+    def claim(self, model: str, text: str) -> Tuple[str, any]:
+        """
+        :return: ('hit', (title, summary)) for a stored near-duplicate;
+                 ('wait', Future) when another run is summarizing one right now;
+                 ('own', segment id) when the caller must summarize it and then resolve() or abandon();
+                 ('skip', None) for segments too short to deduplicate
+        """
+        if len(normalize(text).split()) < self.min_words:
+            return 'skip', None
+        signature = self.hasher.signature(text)
+        with self.lock:
+            match = self._best_match(model, signature)
+            if match:
+                segment_id, title, summary = match
+                if title is not None:
+                    return 'hit', (title, summary)
+                if segment_id in self.claims:
+                    return 'wait', self.claims[segment_id]
+            with self.conn:
+                segment_id = self.conn.execute(
+                    "INSERT INTO segments (model, signature, created) VALUES (?, ?, ?)",
+                    (model, signature.tobytes(), time.time())
+                ).lastrowid
+                self.conn.executemany("INSERT INTO bands (band, bucket, segment_id) VALUES (?, ?, ?)",
+                                      ((band, bucket, segment_id) for band, bucket in self._buckets(signature)))
+            self.claims[segment_id] = Future()
+            return 'own', segment_id
+
+    def resolve(self, segment_id: int, title: str, summary: str):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("UPDATE segments SET title = ?, summary = ? WHERE id = ?",
+                                  (title, summary, segment_id))
+            future = self.claims.pop(segment_id, None)
+        if future:
+            future.set_result((title, summary))
+
+    def abandon(self, segment_id: int, error: Optional[BaseException] = None):
+        """Release a claim that will not be completed; waiters get `error` and summarize for themselves."""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM bands WHERE segment_id = ?", (segment_id,))
+                self.conn.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+            future = self.claims.pop(segment_id, None)
+        if future:
+            future.set_exception(error or RuntimeError("duplicate segment was not summarized"))
+
+    def stats(self) -> dict:
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM segments WHERE title IS NOT NULL").fetchone()[0]
+        return {'segments': count, 'claimed': len(self.claims)}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
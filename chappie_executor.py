@@ -0,0 +1,178 @@
+# chappie_executor.py
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Callable, List, Optional, Sequence
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float = 1, cancel_event: Optional[threading.Event] = None):
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                delay = (amount - self.tokens) / self.rate
+            if cancel_event is None:
+                time.sleep(delay)
+            elif cancel_event.wait(delay):
+                raise CancelledError()
+
+
+def status_code_of(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status
+
+
+def is_retryable(error: Exception) -> bool:
+    if status_code_of(error) in RETRYABLE_STATUS_CODES:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def retry_after_of(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMExecutor:
+    """
+    Bounded thread pool for LLM calls with request/token rate limiting and
+    retry with jittered exponential backoff on 429/5xx responses.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0, metrics=None):
+        self.max_concurrency = max_concurrency
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="chappie-llm")
+        # Submitted calls not yet finished, so shutdown() can drop the queued ones
+        self.futures = set()
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Optional chappie_metrics.Metrics receiving per-call latency, waits and retries
+        self.metrics = metrics
+        # How often map() checks its cancel_event while waiting on calls in flight
+        self.poll_interval = 0.1
+
+    def _throttle(self, tokens: int, cancel_event: threading.Event):
+        if self.request_bucket:
+            self.request_bucket.acquire(1, cancel_event)
+        if self.token_bucket and tokens:
+            self.token_bucket.acquire(tokens, cancel_event)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_of(error)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        # Full jitter: spread retries so concurrent workers don't stampede together
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn: Callable[[], any], tokens: int = 0, *, cancel_event: threading.Event):
+        """
+        :param cancel_event: The caller's own token: once set, rate-limit and backoff waits end early
+                             and no further attempt is made. There is deliberately no executor-wide
+                             cancel, so one run's cancel can never leak into another's.
+        """
+        attempts = 0
+        started = time.perf_counter()
+        waited = 0.0
+        try:
+            while True:
+                wait_started = time.perf_counter()
+                self._throttle(tokens, cancel_event)
+                waited += time.perf_counter() - wait_started
+                if cancel_event.is_set():
+                    raise CancelledError()
+                attempts += 1
+                try:
+                    return fn()
+                except Exception as e:
+                    if self.metrics:
+                        self.metrics.record_llm_error(status_code_of(e))
+                    if attempts > self.max_retries or not is_retryable(e):
+                        raise
+                    delay = self._backoff(attempts - 1, e)
+                    logging.warning(f"LLM call failed ({e}); retry {attempts}/{self.max_retries} in {delay:.1f}s")
+                    if cancel_event.wait(delay):
+                        raise CancelledError()
+                    waited += delay
+        finally:
+            if self.metrics and attempts:
+                self.metrics.record_llm_call(time.perf_counter() - started, waited, attempts)
+
+    def map(self, fn: Callable[[any], any], items: Sequence[any], tokens: Optional[Sequence[int]] = None,
+            on_result: Optional[Callable[[int, any], None]] = None, *,
+            cancel_event: threading.Event) -> List[any]:
+        """
+        Run `fn` over all items at once and return the results in input order.
+
+        :param on_result: Called with (index, result) as each item completes, from the calling thread
+        :param cancel_event: The caller's own token, as for call()
+        :raises CancelledError: Once cancelled, without waiting for calls still in flight
+        """
+        if tokens is None:
+            tokens = [0] * len(items)
+        futures = [self._submit(partial(fn, item), cost, cancel_event) for item, cost in zip(items, tokens)]
+        index_of = {future: i for i, future in enumerate(futures)}
+        pending = set(futures)
+        try:
+            while pending:
+                if cancel_event.is_set():
+                    raise CancelledError()
+                done, pending = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if on_result:
+                        on_result(index_of[future], result)
+        except BaseException:
+            # Drop queued calls; running ones finish in the background and are ignored
+            for future in futures:
+                future.cancel()
+            raise
+        return [future.result() for future in futures]
+
+    def _submit(self, fn: Callable[[], any], tokens: int, cancel_event: threading.Event):
+        future = self.pool.submit(self.call, fn, tokens, cancel_event=cancel_event)
+        self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+        return future
+
+    def shutdown(self):
+        # By hand rather than shutdown(cancel_futures=True), which needs Python 3.9
+        for future in list(self.futures):
+            future.cancel()
+        self.pool.shutdown(wait=False)
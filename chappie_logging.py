@@ -0,0 +1,57 @@
+# chappie_logging.py
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from typing import Optional
+
+# Libraries that log far too much at DEBUG; numba alone dumps bytecode for every JIT compile librosa triggers
+LIBRARY_LOG_LEVELS = {
+    "numba": logging.WARNING,
+    "urllib3": logging.WARNING,
+    "httpx": logging.WARNING,
+    "httpcore": logging.WARNING,
+    "openai": logging.WARNING,
+    "PIL": logging.WARNING,
+    "matplotlib": logging.WARNING,
+    "audioread": logging.WARNING,
+}
+LOG_FORMAT = "%(asctime)s %(levelname)s %(threadName)s %(name)s: %(message)s"
+
+
+def quiet_libraries():
+    for name, level in LIBRARY_LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def setup_logging(path: str = "chappie.log", level: Optional[int] = None,
+                  max_bytes: int = 5 * 2 ** 20, backup_count: int = 3) -> logging.handlers.QueueListener:
+    """
+    Log through a queue to a rotating file, so logging never blocks the UI thread on disk I/O.
+
+    The level defaults to $CHAPPIE_LOG_LEVEL, else INFO.
+
+    :return: The running listener; it is stopped (and the queue flushed) at exit
+    """
+    if level is None:
+        level = logging.getLevelName(os.environ.get("CHAPPIE_LOG_LEVEL", "INFO").upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding='utf-8', delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    quiet_libraries()
+    return listener
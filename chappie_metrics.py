@@ -0,0 +1,207 @@
+# chappie_metrics.py
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Tuple
+
+# USD per 1K (prompt, completion) tokens; dated snapshots match their family by prefix
+PRICING_PER_1K_TOKENS = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-3.5-turbo-16k": (0.003, 0.004),
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+}
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384)
+
+METRIC_HELP = {
+    "stage_seconds": "Wall time of each processing stage",
+    "llm_call_seconds": "Wall time of each LLM call, including retries and backoff",
+    "llm_wait_seconds": "Time each LLM call spent waiting on rate limits and backoff",
+    "llm_prompt_tokens": "Prompt tokens per LLM call",
+    "llm_completion_tokens": "Completion tokens per LLM call",
+    "llm_requests_total": "LLM requests sent, including retries",
+    "llm_retries_total": "LLM requests retried after a retryable error",
+    "llm_errors_total": "Failed LLM requests by HTTP status",
+    "llm_prompt_tokens_total": "Prompt tokens sent",
+    "llm_completion_tokens_total": "Completion tokens received",
+    "llm_cost_usd_total": "Estimated spend from PRICING_PER_1K_TOKENS",
+    "cache_hits_total": "LLM responses served from the response cache",
+    "cache_misses_total": "LLM responses not found in the response cache",
+    "files_total": "Files processed by status",
+    "chapters_reused_total": "Chapters whose title and summary were reused from a previous run",
+    "chapters_deduplicated_total": "Chapters whose title and summary were reused from a near-duplicate segment",
+}
+
+
+def price_of(model_name: str) -> Optional[Tuple[float, float]]:
+    if model_name in PRICING_PER_1K_TOKENS:
+        return PRICING_PER_1K_TOKENS[model_name]
+    matches = [name for name in PRICING_PER_1K_TOKENS if model_name.startswith(name)]
+    return PRICING_PER_1K_TOKENS[max(matches, key=len)] if matches else None
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (the observed max for the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+            'buckets': {('+Inf' if math.isinf(bound) else bound): count
+                        for bound, count in zip(self.buckets, self.counts)},
+        }
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """
+    Thread-safe counters and histograms for one processor, exported as JSON or a
+    Prometheus textfile (for node_exporter's textfile collector).
+    """
+
+    def __init__(self, model_name: Optional[str] = None, prefix: str = "chappie"):
+        self.model_name = model_name
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self.started = time.time()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = SECONDS_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def record_llm_call(self, seconds: float, waited: float, attempts: int):
+        self.observe("llm_call_seconds", seconds)
+        self.observe("llm_wait_seconds", waited)
+        self.inc("llm_requests_total", attempts)
+        if attempts > 1:
+            self.inc("llm_retries_total", attempts - 1)
+
+    def record_llm_error(self, status: Optional[int]):
+        self.inc("llm_errors_total", status=str(status) if status is not None else "none")
+
+    def record_tokens(self, prompt_tokens: int, completion_tokens: int):
+        self.observe("llm_prompt_tokens", prompt_tokens, TOKEN_BUCKETS)
+        self.observe("llm_completion_tokens", completion_tokens, TOKEN_BUCKETS)
+        self.inc("llm_prompt_tokens_total", prompt_tokens)
+        self.inc("llm_completion_tokens_total", completion_tokens)
+        price = price_of(self.model_name) if self.model_name else None
+        if price:
+            self.inc("llm_cost_usd_total", (prompt_tokens * price[0] + completion_tokens * price[1]) / 1000)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def to_dict(self) -> Dict[str, any]:
+        with self.lock:
+            counters, histograms = {}, {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters[name + _label_text(labels)] = value
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                histograms[name + _label_text(labels)] = histogram.to_dict()
+        return {'model': self.model_name, 'started': self.started, 'exported': time.time(),
+                'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self) -> str:
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {self.prefix}_{name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                describe(name, "counter")
+                lines.append(f"{self.prefix}_{name}{_label_text(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                describe(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if math.isinf(bound) else repr(float(bound))
+                    bucket_labels = _label_text(labels, 'le="' + le + '"')
+                    lines.append(f"{self.prefix}_{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.prefix}_{name}_sum{_label_text(labels)} {histogram.sum}")
+                lines.append(f"{self.prefix}_{name}_count{_label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Export to `path`: Prometheus text format for .prom files, JSON otherwise."""
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_dict(), indent=2)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Scrapers must never read a half-written file
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(temp_path, path)
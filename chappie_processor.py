@@ -1,27 +1,263 @@
 # chappie_processor.py
 
-from typing import List, Dict
-from langchain_openai import ChatOpenAI
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from chappie_utils import parse_srt, seconds_to_time
+from typing import List, Dict, Optional
+from concurrent.futures import FIRST_EXCEPTION, CancelledError, ThreadPoolExecutor, wait
+from chappie_batch import BatchProcessor, content_hash
+from chappie_cache import ResponseCache
+from chappie_executor import LLMExecutor
+from chappie_metrics import Metrics
+from chappie_tokens import TokenCounter, context_tokens, pack_by_budget
+from chappie_utils import SrtCues, seconds_to_time, default_cache_dir
+import json
+import logging
 import os
+import threading
+import numpy as np
+
+COMBINED_TEMPLATE = (
+    "Read the following chapter and reply with only a JSON object of the form "
+    '{{"title": "<short, descriptive title>", "summary": "<one-sentence summary>"}}.\n\n'
+    "Chapter: {chapter_content}"
+)
+
+OVERALL_TEMPLATE = "Provide a brief summary of the following transcript: {transcript}"
+MAP_TEMPLATE = "Summarize the following part of a transcript in a short paragraph: {transcript}"
+REDUCE_TEMPLATE = "Combine the following summaries of consecutive parts of a transcript into one short paragraph: {summaries}"
+FINAL_REDUCE_TEMPLATE = (
+    "Provide a brief summary of a transcript from the following summaries of its consecutive parts: {summaries}"
+)
+
+def pack_pieces(pieces: List[str], budget: int, counter: TokenCounter) -> List[str]:
+    """
+    Greedily join consecutive pieces into groups of at most `budget` tokens.
+
+    Every group takes at least two pieces when available, so each reduce round
+    at least halves the number of pieces even when they are individually large.
+    """
+    groups = []
+    current = []
+    size = 0
+    for piece, count in zip(pieces, counter.count_many(pieces).tolist()):
+        if current and len(current) >= 2 and size + count > budget:
+            groups.append(current)
+            current, size = [], 0
+        current.append(piece)
+        size += count + 1
+    if current:
+        groups.append(current)
+
+    packed = []
+    for group in groups:
+        joined = "\n\n".join(group)
+        if counter.count(joined) > budget:
+            # Oversized pieces each give up an equal share rather than dropping the last ones
+            share = max(1, budget // len(group) - 1)
+            joined = "\n\n".join(counter.truncate(piece, share) for piece in group)
+        packed.append(joined)
+    return packed
+
+def parse_title_summary(reply: str) -> Optional[Dict[str, str]]:
+    """
+    Parse a combined-mode reply into a title/summary dict.
+
+    :param reply: Raw model output, possibly wrapped in a Markdown code fence
+    :return: Dict with non-empty 'title' and 'summary', or None if the reply is malformed
+    """
+    start, end = reply.find('{'), reply.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(reply[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    title, summary = data.get('title'), data.get('summary')
+    if not isinstance(title, str) or not isinstance(summary, str) or not title.strip() or not summary.strip():
+        return None
+    return {'title': title.strip(), 'summary': summary.strip()}
+
+class ChapterProgress:
+    """Collects each pending chapter's title and summary, reporting a chapter once it has both."""
+
+    def __init__(self, chapters: List[Dict[str, any]], todo: List[int], callback):
+        self.chapters = chapters
+        self.todo = todo
+        self.callback = callback
+        self.parts = [{} for _ in todo]
+        self.done = len(chapters) - len(todo)
+        self.lock = threading.Lock()
+
+    def add(self, i: int, field: str, value: str):
+        """:param i: Index into `todo`"""
+        with self.lock:
+            self.parts[i][field] = value
+            if len(self.parts[i]) == 2:
+                self.done += 1
+                index = self.todo[i]
+                self.callback(index, dict(self.chapters[index], title=self.parts[i]['title']),
+                              self.parts[i]['summary'], self.done, len(self.chapters))
+
+    def add_title(self, i: int, title: str):
+        self.add(i, 'title', title.strip())
+
+    def add_summary(self, i: int, summary: str):
+        self.add(i, 'summary', summary)
+
+    def add_both(self, i: int, title: str, summary: str):
+        self.add(i, 'title', title)
+        self.add(i, 'summary', summary)
 
 class ChappieProcessor:
-    def __init__(self, api_key: str):
-        self.llm = ChatOpenAI(
+    def __init__(self, api_key: str, llm=None, max_concurrency: int = 8,
+                 requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None,
+                 max_retries: int = 5, combined_mode: bool = False,
+                 use_cache: bool = True, cache_path: Optional[str] = None,
+                 overall_summary_mode: str = "map_reduce",
+                 min_chapter_seconds: float = 120.0, max_chapter_seconds: float = 600.0,
+                 pause_snap_seconds: float = 1.0, model_name: str = "gpt-3.5-turbo-16k",
+                 prompt_token_budget: Optional[int] = None, chapter_token_budget: Optional[int] = 1500,
+                 metrics: Optional[Metrics] = None, request_timeout: float = 60.0, dedup=None):
+        self.max_tokens = 1000
+        self.model_name = getattr(llm, 'model_name', None) or model_name
+        self.token_counter = TokenCounter(self.model_name)
+        # Stage timings, per-call latency/retries and token spend, accumulated over the processor's lifetime
+        self.metrics = metrics or Metrics(self.model_name)
+        if self.metrics.model_name is None:
+            self.metrics.model_name = self.model_name
+        # Largest input per call: the model's window less the completion and the prompt wording
+        self.prompt_token_budget = prompt_token_budget or context_tokens(self.model_name) - self.max_tokens - 200
+        # Without audio pauses, chapters are packed from whole cues up to this many tokens
+        # (None restores the fixed 10-cue split)
+        self.chapter_token_budget = chapter_token_budget
+        # Audio-aware chaptering: cut at pauses near cue gaps, within these duration limits
+        self.min_chapter_seconds = min_chapter_seconds
+        self.max_chapter_seconds = max_chapter_seconds
+        self.pause_snap_seconds = pause_snap_seconds
+        # "map_reduce" summarizes the whole cleaned transcript in parallel chunks;
+        # "chapters" reduces the chapter summaries instead of re-reading the text
+        self.overall_summary_mode = overall_summary_mode
+        # Ask for title and summary in one JSON reply instead of two round trips per chapter
+        self.combined_mode = combined_mode
+        # Optional chappie_dedup.DedupStore: near-duplicate chapters across files (intros, sponsor
+        # reads) reuse one title and summary instead of each being sent to the model
+        self.dedup = dedup
+        # Bounds how long a cancelled run can leave a request running in the background
+        self.request_timeout = request_timeout
+        # Retries are handled by the executor so they can share the rate limiter
+        self.llm = llm or self._default_llm(api_key)
+        self.executor = LLMExecutor(
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            max_retries=max_retries,
+            metrics=self.metrics
+        )
+        # Pass use_cache=False to always request fresh generations
+        self.cache = None
+        if use_cache:
+            self.cache = ResponseCache(cache_path or os.path.join(default_cache_dir(), "llm_cache.sqlite"))
+
+    def _default_llm(self, api_key: str):
+        # LangChain and the OpenAI client take seconds to import, so load them only when a processor is built
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
             api_key=api_key,
-            model_name="gpt-3.5-turbo-16k",
+            model_name=self.model_name,
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=self.max_tokens,
+            max_retries=0,
+            timeout=self.request_timeout
         )
 
-    def process_srt(self, srt_content: str) -> Dict[str, any]:
-        entries = parse_srt(srt_content)
-        chapters = self._generate_chapters(entries)
-        chapter_summaries = self._generate_summaries(chapters)
-        overall_summary = self._generate_overall_summary(srt_content)
-        chapter_titles = self.generate_chapter_titles(chapters)
+    def process_srt(self, srt_content: str, pauses: Optional[np.ndarray] = None,
+                    previous: Optional[Dict[str, any]] = None, on_chapter=None,
+                    cancel_event: Optional[threading.Event] = None) -> Dict[str, any]:
+        """
+        :param previous: An earlier result for this transcript; its chapter boundaries are kept and
+                         chapters whose text is unchanged reuse their title and summary
+        :param on_chapter: Called as on_chapter(index, chapter, summary, done, total) as each chapter's
+                           title and summary become available, from a worker thread
+        :param cancel_event: Setting it aborts this run only; without one, the run can't be cancelled
+        :raises CancelledError: If the run is cancelled
+        """
+        if cancel_event is None:
+            cancel_event = threading.Event()
+        with self.metrics.span("parse"):
+            cues = SrtCues.from_srt(srt_content)
+        with self.metrics.span("chaptering"):
+            chapters = self._generate_chapters(cues, pauses, previous['chapters'] if previous else None)
+
+        reused = {}
+        if previous:
+            for chapter, summary in zip(previous['chapters'], previous['chapter_summaries']):
+                reused[chapter.get('hash') or content_hash(chapter['text'])] = (chapter['title'], summary)
+        todo = [i for i, chapter in enumerate(chapters) if chapter['hash'] not in reused]
+        self.metrics.inc("chapters_reused_total", len(chapters) - len(todo))
+        reuse_overall = bool(previous) and not todo and 'overall_summary' in previous
+        owned, waiting = {}, {}
+        if self.dedup and todo:
+            todo, owned, waiting = self._claim_duplicates(chapters, todo, reused)
+        pending = [chapters[i] for i in todo]
+        # Progress positions: chapters generated here first, then those awaited from concurrent runs
+        order = todo + list(waiting)
+        progress = ChapterProgress(chapters, order, on_chapter) if on_chapter else None
+        if on_chapter:
+            done = 0
+            for i, chapter in enumerate(chapters):
+                if chapter['hash'] in reused:
+                    done += 1
+                    title, summary = reused[chapter['hash']]
+                    on_chapter(i, dict(chapter, title=title), summary, done, len(chapters))
+
+        # The stages only wait on the executor, so they can all be in flight at once. They share a
+        # run-local stop event, set when any of them fails or the caller cancels, so none outlives the run
+        stop_event = threading.Event()
+        with ThreadPoolExecutor(max_workers=3) as stages:
+            try:
+                overall_future = None
+                if self.overall_summary_mode != "chapters" and not reuse_overall:
+                    overall_future = stages.submit(self._timed, "overall", self._generate_overall_summary, cues,
+                                                   None, stop_event)
+                watch = [overall_future] if overall_future else []
+                new_titles, new_summaries = self._gather_generation(
+                    self._submit_generation(stages, pending, stop_event, progress), cancel_event, stop_event, watch)
+
+                chapter_titles, chapter_summaries = [], []
+                generated = dict(zip(todo, zip(new_titles, new_summaries)))
+                for i, segment_id in owned.items():
+                    self.dedup.resolve(segment_id, *generated[i])
+                owned = {}
+                if waiting:
+                    awaited, failed = self._await_duplicates(waiting, len(todo), progress, cancel_event)
+                    generated.update(awaited)
+                    if failed:
+                        retry_chapters = [chapters[i] for _, i in failed]
+                        titles, summaries = self._gather_generation(
+                            self._submit_generation(stages, retry_chapters, stop_event), cancel_event, stop_event,
+                            watch)
+                        for (position, i), title, summary in zip(failed, titles, summaries):
+                            generated[i] = (title, summary)
+                            if progress:
+                                progress.add_both(position, title, summary)
+                for i, chapter in enumerate(chapters):
+                    title, summary = generated[i] if i in generated else reused[chapter['hash']]
+                    chapter_titles.append(title)
+                    chapter_summaries.append(summary)
+
+                if reuse_overall:
+                    overall_summary = previous['overall_summary']
+                else:
+                    if not overall_future:
+                        overall_future = stages.submit(self._timed, "overall", self._generate_overall_summary,
+                                                       cues, chapter_summaries, stop_event)
+                    overall_summary = self._gather([overall_future], cancel_event, stop_event)[0]
+            except BaseException as e:
+                # Stop the sibling stages before the pool waits on them
+                stop_event.set()
+                for segment_id in owned.values():
+                    self.dedup.abandon(segment_id, e)
+                raise
 
         for i, title in enumerate(chapter_titles):
             chapters[i]['title'] = title
@@ -32,78 +268,303 @@ class ChappieProcessor:
             'overall_summary': overall_summary
         }
 
-    def _generate_chapters(self, entries: List[Dict[str, any]]) -> List[Dict[str, any]]:
-        chapters = []
-        current_chapter_start = entries[0]['start']
-        current_chapter_text = ""
-
-        for i, entry in enumerate(entries):
-            if i > 0 and i % 10 == 0:  # Create a new chapter every 10 entries
-                chapters.append({
-                    'start': current_chapter_start,
-                    'end': entries[i-1]['end'],
-                    'text': current_chapter_text.strip(),
-                    'title': f"Chapter {len(chapters) + 1}"  # Add a default title
-                })
-                current_chapter_start = entry['start']
-                current_chapter_text = ""
-            
-            current_chapter_text += entry['text'] + " "
-
-        # Add the last chapter
-        chapters.append({
-            'start': current_chapter_start,
-            'end': entries[-1]['end'],
-            'text': current_chapter_text.strip(),
-            'title': f"Chapter {len(chapters) + 1}"  # Add a default title
-        })
+    def _claim_duplicates(self, chapters: List[Dict[str, any]], todo: List[int], reused: Dict[str, tuple]):
+        """
+        Look up each pending chapter in the dedup store. Stored near-duplicates are added to `reused`.
+
+        :return: (chapters to generate, {chapter: claimed segment id}, {chapter: Future of a concurrent run's result})
+        """
+        generate, owned, waiting = [], {}, {}
+        for i in todo:
+            status, value = self.dedup.claim(self.model_name, chapters[i]['text'])
+            if status == 'hit':
+                reused[chapters[i]['hash']] = value
+            elif status == 'wait':
+                waiting[i] = value
+            else:
+                generate.append(i)
+                if status == 'own':
+                    owned[i] = value
+        self.metrics.inc("chapters_deduplicated_total", len(todo) - len(generate) - len(waiting))
+        return generate, owned, waiting
+
+    def _await_duplicates(self, waiting: Dict[int, any], first_position: int,
+                          progress: Optional[ChapterProgress], cancel_event: threading.Event):
+        """
+        Collect (title, summary) for chapters another run was summarizing.
+
+        :return: ({chapter: (title, summary)}, [(progress position, chapter)] the other run gave up on)
+        """
+        results, failed = {}, []
+        for position, (i, future) in enumerate(waiting.items(), first_position):
+            while not wait([future], timeout=self.executor.poll_interval).done:
+                if cancel_event.is_set():
+                    raise CancelledError()
+            if future.exception() is not None:
+                failed.append((position, i))
+                continue
+            results[i] = future.result()
+            self.metrics.inc("chapters_deduplicated_total")
+            if progress:
+                progress.add_both(position, *results[i])
+        return results, failed
+
+    def _submit_generation(self, stages: ThreadPoolExecutor, chapters: List[Dict[str, any]],
+                           stop_event: threading.Event, progress: Optional[ChapterProgress] = None) -> list:
+        """Start title and summary generation for `chapters` as stages; collect them with _gather_generation."""
+        if self.combined_mode:
+            return [stages.submit(self._timed, "titles_and_summaries", self._generate_titles_and_summaries,
+                                  chapters, progress.add_both if progress else None, stop_event)]
+        return [
+            stages.submit(self._timed, "titles", self.generate_chapter_titles, chapters,
+                          progress.add_title if progress else None, stop_event),
+            stages.submit(self._timed, "summaries", self._generate_summaries, chapters,
+                          progress.add_summary if progress else None, stop_event),
+        ]
+
+    def _gather_generation(self, futures: list, cancel_event: threading.Event, stop_event: threading.Event,
+                           watch=()):
+        """:return: (titles, summaries) from the futures of _submit_generation"""
+        results = self._gather(futures, cancel_event, stop_event, watch)
+        return results[0] if self.combined_mode else tuple(results)
+
+    def _gather(self, futures: list, cancel_event: threading.Event, stop_event: threading.Event, watch=()) -> list:
+        """
+        Wait for stage `futures` and return their results in order.
+
+        The first failure among them or the `watch` futures, or the caller setting `cancel_event`,
+        sets `stop_event` so the other stages stop at once instead of being waited out.
+        """
+        pending = set(futures)
+        try:
+            while pending:
+                if cancel_event.is_set():
+                    raise CancelledError()
+                done, pending = wait(pending, timeout=self.executor.poll_interval, return_when=FIRST_EXCEPTION)
+                for future in list(done) + [future for future in watch if future.done()]:
+                    future.result()
+        except BaseException:
+            stop_event.set()
+            raise
+        return [future.result() for future in futures]
+
+    def _timed(self, stage: str, fn, *args):
+        with self.metrics.span(stage):
+            return fn(*args)
+
+    def _generate_chapters(self, entries, pauses: Optional[np.ndarray] = None,
+                           previous_chapters: Optional[List[Dict[str, any]]] = None) -> List[Dict[str, any]]:
+        # Accepts either parse_srt dicts or columnar SrtCues
+        cues = entries if isinstance(entries, SrtCues) else SrtCues.from_entries(entries)
+        if previous_chapters:
+            bounds = self._previous_boundaries(cues, previous_chapters, pauses)
+        else:
+            bounds = self._boundaries(cues, pauses)
 
+        chapters = []
+        for first, last in zip(bounds, bounds[1:] + [len(cues)]):
+            text = cues.span_text(first, last)
+            chapters.append({
+                'start': float(cues.starts[first]),
+                'end': float(cues.ends[last - 1]),
+                'text': text,
+                'title': f"Chapter {len(chapters) + 1}",  # Add a default title
+                'hash': content_hash(text)
+            })
         return chapters
 
-    def _generate_summaries(self, chapters: List[Dict[str, any]]) -> List[str]:
-        prompt = PromptTemplate(
-            input_variables=["chapter_content"],
-            template="Summarize the following chapter in one sentence: {chapter_content}"
-        )
+    def _boundaries(self, cues: SrtCues, pauses: Optional[np.ndarray] = None) -> List[int]:
+        if pauses is not None and len(pauses) and len(cues) > 1:
+            return self._audio_boundaries(cues, pauses)
+        if self.chapter_token_budget:
+            return pack_by_budget(self.token_counter.cue_counts(cues), self.chapter_token_budget)
+        return list(range(0, len(cues), 10))  # Create a new chapter every 10 entries
+
+    def _previous_boundaries(self, cues: SrtCues, previous_chapters: List[Dict[str, any]],
+                             pauses: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Cut at the previous run's chapter starts, so editing a cue's text only changes its own chapter.
+
+        Cues that start after the previous last chapter ended are chaptered as usual.
+        """
+        if not len(cues):
+            return []
+        starts = np.searchsorted(cues.starts, [chapter['start'] for chapter in previous_chapters], side='left')
+        bounds = sorted(bound for bound in set(starts.tolist()) | {0} if bound < len(cues))
+        tail = int(np.searchsorted(cues.starts, previous_chapters[-1]['end'], side='left'))
+        if bounds[-1] < tail < len(cues):
+            bounds += [tail + bound for bound in self._boundaries(cues.slice(tail, len(cues)), pauses)]
+        return bounds
+
+    def _audio_boundaries(self, cues: SrtCues, pauses: np.ndarray) -> List[int]:
+        """
+        Index of the first cue of each chapter, cutting in the cue gaps that line up best with audio pauses.
+
+        :param pauses: (start, end) seconds of detected pauses, sorted by start
+        """
+        starts, ends = cues.starts, cues.ends
+        # Candidate i (1..n-1) is the gap before cue i; score it by the nearest pause within snapping distance
+        gap_middles = (ends[:-1] + starts[1:]) / 2
+        centers = pauses.mean(axis=1)
+        right = np.searchsorted(centers, gap_middles).clip(0, len(centers) - 1)
+        left = (right - 1).clip(0, len(centers) - 1)
+        nearest = np.where(np.abs(centers[left] - gap_middles) < np.abs(centers[right] - gap_middles), left, right)
+        pause_starts, pause_ends = pauses[nearest, 0], pauses[nearest, 1]
+        distance = np.maximum(0.0, np.maximum(pause_starts - gap_middles, gap_middles - pause_ends))
+        snapped = distance <= self.pause_snap_seconds
+        scores = np.where(snapped, pause_ends - pause_starts, 0.0) + np.maximum(starts[1:] - ends[:-1], 0.0)
+
+        bounds = [0]
+        first = 0
+        last_start = np.searchsorted(starts, ends[-1] - self.min_chapter_seconds, side='right')
+        while ends[-1] - starts[first] > self.max_chapter_seconds:
+            lo = max(first + 1, np.searchsorted(starts, starts[first] + self.min_chapter_seconds))
+            hi = np.searchsorted(starts, starts[first] + self.max_chapter_seconds, side='right')
+            if lo >= len(cues):
+                break
+            # Prefer cuts that leave at least a minimum-length final chapter
+            if min(hi, last_start) > lo:
+                hi = min(hi, last_start)
+            if hi <= lo:
+                boundary = lo  # one cue longer than the window: cut right after it
+            else:
+                boundary = lo + int(np.argmax(scores[lo - 1:hi - 1]))
+            bounds.append(boundary)
+            first = boundary
+        return bounds
+
+    def _fit(self, text: str) -> str:
+        return self.token_counter.truncate(text, self.prompt_token_budget)
+
+    def _cache_key(self, template: str, content: str) -> str:
+        model = getattr(self.llm, 'model_name', None) or type(self.llm).__name__
+        return ResponseCache.make_key(model, getattr(self.llm, 'temperature', None), template, content)
+
+    def _run_prompt(self, template: str, input_variable: str, contents: List[str], on_result=None,
+                    cancel_event: Optional[threading.Event] = None) -> List[str]:
+        """:param on_result: Called with (index, text) for each content as its reply arrives"""
+        if cancel_event is None:
+            cancel_event = threading.Event()
+        keys = [self._cache_key(template, content) for content in contents] if self.cache else None
+        results = [self.cache.get(key) for key in keys] if self.cache else [None] * len(contents)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if on_result:
+            for i, result in enumerate(results):
+                if result is not None:
+                    on_result(i, result)
+        if self.cache:
+            self.metrics.inc("cache_hits_total", len(contents) - len(missing))
+            self.metrics.inc("cache_misses_total", len(missing))
+        if not missing:
+            return results
+
+        from langchain.chains import LLMChain
+        from langchain.prompts import PromptTemplate
+
+        prompt = PromptTemplate(input_variables=[input_variable], template=template)
         chain = LLMChain(llm=self.llm, prompt=prompt)
-        
-        summaries = []
-        for chapter in chapters:
-            summary = chain.invoke({"chapter_content": chapter['text'][:4000]})  # Limit to 4000 characters
-            summaries.append(summary['text'])
-        
-        return summaries
-
-    def _generate_overall_summary(self, srt_content: str) -> str:
-        prompt = PromptTemplate(
-            input_variables=["transcript"],
-            template="Provide a brief summary of the following transcript: {transcript}"
+
+        template_tokens = self.token_counter.count(template)
+        prompt_tokens = {i: template_tokens + self.token_counter.count(contents[i]) for i in missing}
+
+        def invoke(i):
+            text = chain.invoke({input_variable: contents[i]})['text']
+            self.metrics.record_tokens(prompt_tokens[i], self.token_counter.count(text))
+            if self.cache:
+                # Store as each call completes so a failed run keeps what it already paid for
+                self.cache.put(keys[i], text)
+            return text
+
+        # max_tokens counts against the TPM limit too
+        tokens = [prompt_tokens[i] + self.max_tokens for i in missing]
+        report = (lambda position, text: on_result(missing[position], text)) if on_result else None
+        texts = self.executor.map(invoke, missing, tokens, report, cancel_event=cancel_event)
+        for i, text in zip(missing, texts):
+            results[i] = text
+        return results
+
+    def _generate_summaries(self, chapters: List[Dict[str, any]], on_result=None,
+                            cancel_event: Optional[threading.Event] = None) -> List[str]:
+        return self._run_prompt(
+            "Summarize the following chapter in one sentence: {chapter_content}",
+            "chapter_content",
+            [self._fit(chapter['text']) for chapter in chapters],
+            on_result,
+            cancel_event
         )
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        
-        result = chain.invoke({"transcript": srt_content[:4000]})  # Limit to 4000 characters
-        return result['text']
-
-    def generate_chapter_titles(self, chapters: List[Dict[str, any]]) -> List[str]:
-        prompt = PromptTemplate(
-            input_variables=["chapter_content"],
-            template="Generate a short, descriptive title for the following chapter content: {chapter_content}"
+
+    def _generate_overall_summary(self, cues: SrtCues, chapter_summaries: Optional[List[str]] = None,
+                                  cancel_event: Optional[threading.Event] = None) -> str:
+        if chapter_summaries is not None:
+            return self._reduce_summaries(chapter_summaries, cancel_event)
+
+        # Summarize the cue text only; indices and timestamps are just noise to the model
+        bounds = pack_by_budget(self.token_counter.cue_counts(cues), self.prompt_token_budget)
+        chunks = [self._fit(cues.span_text(first, last)) for first, last in zip(bounds, bounds[1:] + [len(cues)])]
+        if not chunks:
+            # Nothing to summarize; an empty prompt would only get an invented summary back
+            return ""
+        if len(chunks) == 1:
+            return self._run_prompt(OVERALL_TEMPLATE, "transcript", chunks, None, cancel_event)[0]
+        return self._reduce_summaries(self._run_prompt(MAP_TEMPLATE, "transcript", chunks, None, cancel_event),
+                                      cancel_event)
+
+    def _reduce_summaries(self, summaries: List[str], cancel_event: Optional[threading.Event] = None) -> str:
+        # Tree reduction: each round packs neighbouring summaries into prompts of bounded size
+        groups = pack_pieces(summaries, self.prompt_token_budget, self.token_counter)
+        if not groups:
+            return ""
+        while len(groups) > 1:
+            groups = pack_pieces(self._run_prompt(REDUCE_TEMPLATE, "summaries", groups, None, cancel_event),
+                                 self.prompt_token_budget, self.token_counter)
+        return self._run_prompt(FINAL_REDUCE_TEMPLATE, "summaries", groups, None, cancel_event)[0]
+
+    def generate_chapter_titles(self, chapters: List[Dict[str, any]], on_result=None,
+                                cancel_event: Optional[threading.Event] = None) -> List[str]:
+        titles = self._run_prompt(
+            "Generate a short, descriptive title for the following chapter content: {chapter_content}",
+            "chapter_content",
+            [self._fit(chapter['text']) for chapter in chapters],
+            on_result,
+            cancel_event
         )
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        
-        titles = []
-        for chapter in chapters:
-            result = chain.invoke({"chapter_content": chapter['text'][:1000]})  # Limit to 1000 characters
-            titles.append(result['text'].strip())
-        
-        return titles
-
-    def process_directory(self, directory_path: str) -> Dict[str, Dict[str, any]]:
-        results = {}
-        for filename in os.listdir(directory_path):
-            if filename.endswith(".srt"):
-                file_path = os.path.join(directory_path, filename)
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    srt_content = file.read()
-                results[filename] = self.process_srt(srt_content)
-        return results
\ No newline at end of file
+        return [title.strip() for title in titles]
+
+    def _generate_titles_and_summaries(self, chapters: List[Dict[str, any]], on_result=None,
+                                       cancel_event: Optional[threading.Event] = None):
+        """:param on_result: Called with (index, title, summary) as each chapter completes"""
+        def report(i, reply):
+            result = parse_title_summary(reply)
+            if result:
+                on_result(i, result['title'], result['summary'])
+
+        replies = self._run_prompt(
+            COMBINED_TEMPLATE,
+            "chapter_content",
+            [self._fit(chapter['text']) for chapter in chapters],
+            report if on_result else None,
+            cancel_event
+        )
+        parsed = [parse_title_summary(reply) for reply in replies]
+
+        failed = [i for i, result in enumerate(parsed) if result is None]
+        if failed:
+            logging.warning(f"Malformed combined reply for {len(failed)} chapter(s); using separate title/summary calls")
+            retry_chapters = [chapters[i] for i in failed]
+            if cancel_event is None:
+                cancel_event = threading.Event()
+            stop_event = threading.Event()
+            with ThreadPoolExecutor(max_workers=2) as stages:
+                futures = [stages.submit(self.generate_chapter_titles, retry_chapters, None, stop_event),
+                           stages.submit(self._generate_summaries, retry_chapters, None, stop_event)]
+                titles, summaries = self._gather(futures, cancel_event, stop_event)
+                for i, title, summary in zip(failed, titles, summaries):
+                    parsed[i] = {'title': title, 'summary': summary}
+                    if on_result:
+                        on_result(i, title, summary)
+
+        return [result['title'] for result in parsed], [result['summary'] for result in parsed]
+
+    def process_directory(self, directory_path: str, workers: int = 4, on_result=None) -> Dict[str, Dict[str, any]]:
+        records = BatchProcessor(self, workers).process_directory(directory_path, on_result)
+        return {filename: record['result'] for filename, record in records.items() if record['status'] == 'ok'}
@@ -0,0 +1,43 @@
+# chappie_results.py
+
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+# Bump when the sidecar layout changes so old sidecars are ignored
+RESULTS_VERSION = 1
+
+
+def results_path(audio_path: str) -> str:
+    """Sidecar next to the audio, alongside FileManager's `<name>_transcript.srt`."""
+    return os.path.splitext(audio_path)[0] + "_chapters.json"
+
+
+def load_results(audio_path: str) -> Optional[Dict[str, any]]:
+    """
+    :return: {'srt_hash', 'model', 'result'} saved for `audio_path`, or None if there is no usable sidecar
+    """
+    try:
+        with open(results_path(audio_path), 'r', encoding='utf-8') as file:
+            saved = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable chapters sidecar for {audio_path}: {e}")
+        return None
+    if saved.get('version') != RESULTS_VERSION or 'result' not in saved:
+        return None
+    return saved
+
+
+def save_results(audio_path: str, srt_hash: str, result: Dict[str, any], model: Optional[str] = None):
+    path = results_path(audio_path)
+    saved = {'version': RESULTS_VERSION, 'srt_hash': srt_hash, 'model': model, 'result': result}
+    try:
+        # Via rename, so a crash never leaves a torn sidecar in place of a good one
+        with open(path + ".tmp", 'w', encoding='utf-8') as file:
+            json.dump(saved, file, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logging.warning(f"Could not write chapters sidecar for {audio_path}: {e}")
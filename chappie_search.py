@@ -0,0 +1,91 @@
+# chappie_search.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+from chappie_utils import SrtCues, default_cache_dir
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+class TranscriptIndex:
+    """
+    On-disk SQLite FTS5 index mapping transcript words to (file, cue start time).
+
+    Files are re-indexed only when their content hash changes.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        path = path or os.path.join(default_cache_dir(), "search.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE, hash TEXT)")
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS cues USING fts5(text, file_id UNINDEXED, start UNINDEXED)"
+            )
+
+    def index_file(self, path: str, srt_content: str) -> bool:
+        """
+        Index one SRT file unless it is unchanged since it was last indexed.
+
+        :return: True if the file was (re)indexed
+        """
+        path = os.path.abspath(path)
+        content_hash = hashlib.sha256(srt_content.encode('utf-8')).hexdigest()
+        with self.lock:
+            row = self.conn.execute("SELECT id, hash FROM files WHERE path = ?", (path,)).fetchone()
+            if row and row[1] == content_hash:
+                return False
+        cues = SrtCues.from_srt(srt_content)
+        with self.lock, self.conn:
+            if row:
+                file_id = row[0]
+                self.conn.execute("DELETE FROM cues WHERE file_id = ?", (file_id,))
+                self.conn.execute("UPDATE files SET hash = ? WHERE id = ?", (content_hash, file_id))
+            else:
+                file_id = self.conn.execute(
+                    "INSERT INTO files (path, hash) VALUES (?, ?)", (path, content_hash)
+                ).lastrowid
+            self.conn.executemany(
+                "INSERT INTO cues (text, file_id, start) VALUES (?, ?, ?)",
+                ((cues.text_of(i), file_id, float(cues.starts[i])) for i in range(len(cues)))
+            )
+        return True
+
+    def remove_file(self, path: str):
+        path = os.path.abspath(path)
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+            if row:
+                self.conn.execute("DELETE FROM cues WHERE file_id = ?", (row[0],))
+                self.conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+
+    def search(self, text: str, limit: int = 50) -> List[Tuple[str, float, str]]:
+        """
+        :return: (SRT path, cue start seconds, snippet with the hit in [brackets]) by relevance
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        with self.lock:
+            return self.conn.execute(
+                "SELECT files.path, cues.start, snippet(cues, 0, '[', ']', '…', 12) "
+                "FROM cues JOIN files ON files.id = cues.file_id "
+                "WHERE cues MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
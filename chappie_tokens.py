@@ -0,0 +1,93 @@
+# chappie_tokens.py
+
+import logging
+from typing import List
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:
+    # Without tiktoken, counts fall back to a characters-per-token estimate
+    tiktoken = None
+
+# Context window per model; prompts are budgeted against these minus the completion allowance
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+CHARS_PER_TOKEN = 4
+
+
+def context_tokens(model_name: str) -> int:
+    if model_name in MODEL_CONTEXT_TOKENS:
+        return MODEL_CONTEXT_TOKENS[model_name]
+    # Dated snapshots such as "gpt-4o-2024-08-06" share their family's window
+    matches = [name for name in MODEL_CONTEXT_TOKENS if model_name.startswith(name)]
+    return MODEL_CONTEXT_TOKENS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_TOKENS
+
+
+class TokenCounter:
+    """Counts and truncates text in the model's own tokens, using tiktoken when it is installed."""
+
+    def __init__(self, model_name: str):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(model_name)
+                except KeyError:
+                    self.encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                # tiktoken downloads its BPE files on first use, which fails on offline hosts
+                logging.warning(f"Could not load tokenizer for {model_name} ({e}); estimating token counts")
+        self.name = self.encoding.name if self.encoding else "chars"
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_many(self, texts: List[str]) -> np.ndarray:
+        if self.encoding is None:
+            return np.fromiter((self.count(text) for text in texts), dtype=np.int64, count=len(texts))
+        return np.array([len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)], dtype=np.int64)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is None:
+            return text[:max_tokens * CHARS_PER_TOKEN]
+        tokens = self.encoding.encode_ordinary(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens])
+
+    def cue_counts(self, cues) -> np.ndarray:
+        """
+        Token count of every cue in an SrtCues, cached on the cues object.
+
+        Packing chapters and prompts only sums slices of this array, so
+        repacking with another budget never re-tokenizes the transcript.
+        """
+        if self.name not in cues.token_counts:
+            cues.token_counts[self.name] = self.count_many([cues.text_of(i) for i in range(len(cues))])
+        return cues.token_counts[self.name]
+
+
+def pack_by_budget(counts: np.ndarray, budget: int) -> List[int]:
+    """
+    Greedily split consecutive items into groups of at most `budget` tokens.
+
+    :return: Index of the first item of each group; an item larger than the budget gets a group of its own
+    """
+    bounds = [0] if len(counts) else []
+    total = 0
+    for i, count in enumerate(counts.tolist()):
+        if total and total + count > budget:
+            bounds.append(i)
+            total = 0
+        total += count
+    return bounds
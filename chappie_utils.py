@@ -1,5 +1,59 @@
 # chappie_utils.py
 
+import bisect
+import io
+import logging
+import os
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+
+_TWO_DIGITS = {f"{i:02d}": i for i in range(100)}
+_THREE_DIGITS = {f"{i:03d}": i for i in range(1000)}
+
+def _iter_srt_raw(lines: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+    start = end = None
+    text_lines = []
+    in_text = False
+    pending = None  # a digit-only line that is either text or the next cue's index
+    for line in lines:
+        line = line.strip()
+        if ' --> ' in line:
+            pending = None
+            if start is not None:
+                yield start, end, ' '.join(text_lines)
+            start, end = line.split(' --> ', 1)
+            start = start.strip()
+            # Some files carry positioning after the end time
+            end = end.split()[0]
+            text_lines = []
+            in_text = True
+            continue
+        if pending is not None:
+            text_lines.append(pending)
+            pending = None
+        if not line:
+            in_text = False
+        elif in_text:
+            if line.isdigit():
+                pending = line
+            else:
+                text_lines.append(line)
+    if pending is not None:
+        text_lines.append(pending)
+    if start is not None:
+        yield start, end, ' '.join(text_lines)
+
+def iter_srt(lines: Iterable[str]) -> Iterator[Tuple[float, float, str]]:
+    """
+    Stream SRT cues from any iterable of lines, e.g. an open file object.
+
+    :param lines: Iterable of text lines
+    :return: Generator of (start, end, text) tuples
+    """
+    for start, end, text in _iter_srt_raw(lines):
+        yield time_to_seconds(start), time_to_seconds(end), text
+
 def parse_srt(srt_content: str) -> list:
     """
     Parse SRT content into a list of entry dictionaries.
@@ -7,39 +61,106 @@ def parse_srt(srt_content: str) -> list:
     :param srt_content: Content of the SRT file
     :return: List of entry dictionaries
     """
-    entries = []
-    lines = srt_content.strip().split('\n')
-    
-    # Skip metadata
-    start_index = 0
-    for i, line in enumerate(lines):
-        if line.isdigit():
-            start_index = i
-            break
-    
-    # Process SRT entries
-    current_entry = {}
-    for line in lines[start_index:]:
-        if line.strip().isdigit():
-            if current_entry:
-                entries.append(current_entry)
-                current_entry = {}
-        elif ' --> ' in line:
-            start, end = line.split(' --> ')
-            current_entry['start'] = time_to_seconds(start.strip())
-            current_entry['end'] = time_to_seconds(end.strip())
-        elif line.strip():
-            if 'text' not in current_entry:
-                current_entry['text'] = line.strip()
-            else:
-                current_entry['text'] += ' ' + line.strip()
-    
-    if current_entry:
-        entries.append(current_entry)
-    
-    return entries
+    return [{'start': start, 'end': end, 'text': text}
+            for start, end, text in iter_srt(io.StringIO(srt_content.lstrip('\ufeff')))]
+
+class SrtCues:
+    """
+    Compact columnar SRT cues: start/end times as NumPy arrays and all cue text in
+    one buffer, with cue i at text[offsets[i]:offsets[i + 1] - 1] (each cue is
+    followed by a single space, so a run of cues is one slice).
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, text: str, offsets: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+        self.text = text
+        self.offsets = offsets
+        # Per-cue token counts by tokenizer name, filled in by TokenCounter.cue_counts
+        self.token_counts = {}
+
+    @classmethod
+    def from_iter(cls, cues: Iterable[Tuple[float, float, str]]) -> 'SrtCues':
+        starts, ends, offsets = array('d'), array('d'), array('q', [0])
+        buffer = io.StringIO()
+        position = 0
+        for start, end, text in cues:
+            starts.append(start)
+            ends.append(end)
+            position += buffer.write(text) + buffer.write(' ')
+            offsets.append(position)
+        return cls(np.frombuffer(starts, dtype=np.float64), np.frombuffer(ends, dtype=np.float64),
+                   buffer.getvalue(), np.frombuffer(offsets, dtype=np.int64))
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], chunk_size: int = 65536) -> 'SrtCues':
+        """Build from a stream of lines, converting timestamps a chunk at a time."""
+        starts, ends, offsets = array('d'), array('d'), array('q', [0])
+        buffer = io.StringIO()
+        position = 0
+        times = []
+        for start, end, text in _iter_srt_raw(lines):
+            times.append(start)
+            times.append(end)
+            position += buffer.write(text) + buffer.write(' ')
+            offsets.append(position)
+            if len(times) >= chunk_size:
+                seconds = times_to_seconds(times)
+                starts.extend(seconds[0::2])
+                ends.extend(seconds[1::2])
+                times = []
+        if times:
+            seconds = times_to_seconds(times)
+            starts.extend(seconds[0::2])
+            ends.extend(seconds[1::2])
+        return cls(np.frombuffer(starts, dtype=np.float64), np.frombuffer(ends, dtype=np.float64),
+                   buffer.getvalue(), np.frombuffer(offsets, dtype=np.int64))
+
+    @classmethod
+    def from_srt(cls, srt_content: str) -> 'SrtCues':
+        return cls.from_lines(io.StringIO(srt_content.lstrip('\ufeff')))
+
+    @classmethod
+    def from_file(cls, path: str) -> 'SrtCues':
+        # Iterating the file object streams it; the whole file is never held as one string
+        with open(path, 'r', encoding='utf-8-sig', errors='replace') as file:
+            return cls.from_lines(file)
+
+    @classmethod
+    def from_entries(cls, entries: List[Dict[str, any]]) -> 'SrtCues':
+        return cls.from_iter((entry['start'], entry['end'], entry.get('text', '')) for entry in entries)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def text_of(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def span_text(self, first: int, last: int) -> str:
+        """Text of cues first..last-1 joined by spaces."""
+        return self.text[self.offsets[first]:self.offsets[last]].strip()
+
+    def slice(self, first: int, last: int) -> 'SrtCues':
+        """Cues first..last-1 as their own SrtCues, with the same (absolute) times."""
+        return SrtCues(self.starts[first:last], self.ends[first:last],
+                       self.text[self.offsets[first]:self.offsets[last]],
+                       self.offsets[first:last + 1] - self.offsets[first])
+
+    def __getitem__(self, i: int) -> Dict[str, any]:
+        return {'start': float(self.starts[i]), 'end': float(self.ends[i]), 'text': self.text_of(i)}
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
 
 def time_to_seconds(time_str: str) -> float:
+    # Fast path for the canonical fixed-width "HH:MM:SS,mmm" form, without raising on mismatch
+    if len(time_str) == 12 and time_str[2] == ':' and time_str[5] == ':' and time_str[8] in ',.':
+        h = _TWO_DIGITS.get(time_str[0:2])
+        m = _TWO_DIGITS.get(time_str[3:5])
+        s = _TWO_DIGITS.get(time_str[6:8])
+        ms = _THREE_DIGITS.get(time_str[9:12])
+        if h is not None and m is not None and s is not None and ms is not None:
+            return (h * 3600000 + m * 60000 + s * 1000 + ms) / 1000
     try:
         if ',' in time_str:
             time_str = time_str.replace(',', '.')
@@ -54,8 +175,63 @@ def time_to_seconds(time_str: str) -> float:
         logging.error(f"Error parsing time: {time_str}")
         raise
 
+def times_to_seconds(time_strs: List[str]) -> np.ndarray:
+    """
+    Vectorized time_to_seconds for a batch of timestamps.
+
+    Canonical "HH:MM:SS,mmm" strings are decoded with NumPy digit arithmetic;
+    anything else falls back to time_to_seconds one by one.
+    """
+    try:
+        raw = np.array(time_strs, dtype='S12')
+    except UnicodeEncodeError:
+        return np.array([time_to_seconds(t) for t in time_strs], dtype=np.float64)
+    digits = raw.view(np.uint8).reshape(len(raw), 12).astype(np.int64) - ord('0')
+    numeric = digits[:, [0, 1, 3, 4, 6, 7, 9, 10, 11]]
+    separators = raw.view(np.uint8).reshape(len(raw), 12)[:, [2, 5, 8]]
+    canonical = ((numeric >= 0) & (numeric <= 9)).all(axis=1)
+    canonical &= (separators[:, 0] == ord(':')) & (separators[:, 1] == ord(':'))
+    canonical &= (separators[:, 2] == ord(',')) | (separators[:, 2] == ord('.'))
+    canonical &= np.fromiter((len(t) == 12 for t in time_strs), dtype=bool, count=len(time_strs))
+    millis = numeric @ np.array([36000000, 3600000, 600000, 60000, 10000, 1000, 100, 10, 1], dtype=np.int64)
+    seconds = millis / 1000
+    for i in np.flatnonzero(~canonical):
+        seconds[i] = time_to_seconds(time_strs[i])
+    return seconds
+
+class TimelineIndex:
+    """
+    Sorted start times for O(log n) "which item is playing at t" lookups.
+
+    Items are chapters or cues; lookups return the index of the last item that
+    started at or before t in the caller's original order, or -1 before the first.
+    """
+
+    def __init__(self, starts):
+        starts = np.asarray(starts, dtype=np.float64)
+        self.order = np.argsort(starts, kind='stable').tolist()
+        # bisect on a plain list beats np.searchsorted for one scalar per playback tick
+        self.starts = starts[self.order].tolist()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def find(self, seconds: float) -> int:
+        position = bisect.bisect_right(self.starts, seconds) - 1
+        return self.order[position] if position >= 0 else -1
+
 def seconds_to_time(seconds: float) -> str:
     h = int(seconds // 3600)
     m = int((seconds % 3600) // 60)
     s = int(seconds % 60)
-    return f"{h:02d}:{m:02d}:{s:02d}"
\ No newline at end of file
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+def seconds_to_srt_time(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    h, millis = divmod(millis, 3600000)
+    m, millis = divmod(millis, 60000)
+    s, millis = divmod(millis, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{millis:03d}"
+
+def default_cache_dir() -> str:
+    return os.environ.get("CHAPPIE_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".chappie")
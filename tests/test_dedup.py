@@ -0,0 +1,59 @@
+# tests/test_dedup.py
+
+import pytest
+from chappie_dedup import DedupStore
+
+SEGMENT = " ".join(f"word{i}" for i in range(60))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DedupStore(str(tmp_path / "dedup.sqlite"))
+    yield store
+    store.close()
+
+
+def test_concurrent_claim_waits_for_owner(store):
+    status, segment_id = store.claim("model", SEGMENT)
+    assert status == 'own'
+
+    status, future = store.claim("model", SEGMENT + " and a few more words")
+    assert status == 'wait'
+
+    store.resolve(segment_id, "Title", "Summary")
+    assert future.result(timeout=1) == ("Title", "Summary")
+    assert store.claim("model", SEGMENT) == ('hit', ("Title", "Summary"))
+
+
+def test_abandoned_claim_fails_waiters_and_frees_the_segment(store):
+    _, segment_id = store.claim("model", SEGMENT)
+    _, future = store.claim("model", SEGMENT)
+    error = RuntimeError("request failed")
+
+    store.abandon(segment_id, error)
+
+    assert future.exception(timeout=1) is error
+    status, _ = store.claim("model", SEGMENT)
+    assert status == 'own'
+
+
+def test_other_models_and_short_segments_are_not_shared(store):
+    _, segment_id = store.claim("model", SEGMENT)
+    store.resolve(segment_id, "Title", "Summary")
+
+    assert store.claim("other-model", SEGMENT)[0] == 'own'
+    assert store.claim("model", "thanks for listening") == ('skip', None)
+
+
+def test_opening_the_store_keeps_live_claims(tmp_path):
+    path = str(tmp_path / "dedup.sqlite")
+    first = DedupStore(path)
+    _, segment_id = first.claim("model", SEGMENT)
+
+    # e.g. the GUI starting while a CLI batch is mid-run
+    second = DedupStore(path)
+    first.resolve(segment_id, "Title", "Summary")
+
+    assert second.claim("model", SEGMENT) == ('hit', ("Title", "Summary"))
+    first.close()
+    second.close()
@@ -0,0 +1,104 @@
+# tests/test_executor.py
+
+import threading
+import time
+from concurrent.futures import CancelledError
+import pytest
+from chappie_bench import FakeAPIError, FakeChatModel, make_processor
+from chappie_executor import LLMExecutor
+from chappie_metrics import Metrics
+
+
+def expected_reply(prompt):
+    # FakeChatModel echoes the last 12 words of the prompt
+    return " ".join(prompt.split()[-12:])
+
+
+def test_map_keeps_input_order_under_retries():
+    llm = FakeChatModel(latency=0.01, jitter=0.02, failure_rate=0.3, seed=3)
+    processor = make_processor(llm, max_concurrency=4, max_retries=20)
+    contents = [f"chapter {i} " + " ".join(f"w{i}x{k}" for k in range(15)) for i in range(24)]
+    reported = {}
+
+    results = processor._run_prompt("Summarize: {text}", "text", contents, reported.__setitem__)
+
+    assert llm.failures > 0
+    assert results == [expected_reply(f"Summarize: {content}") for content in contents]
+    assert reported == dict(enumerate(results))
+
+
+def test_call_retries_429_then_succeeds():
+    llm = FakeChatModel(latency=0)
+    metrics = Metrics()
+    executor = LLMExecutor(max_concurrency=1, base_delay=0.01, metrics=metrics)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise FakeAPIError("rate limited")
+        return llm.invoke("hello there").content
+
+    assert executor.call(flaky, cancel_event=threading.Event()) == "hello there"
+    assert len(attempts) == 2
+    counters = metrics.to_dict()['counters']
+    assert counters['llm_retries_total'] == 1
+    assert counters['llm_errors_total{status="429"}'] == 1
+    executor.shutdown()
+
+
+def test_call_does_not_retry_other_errors():
+    executor = LLMExecutor(max_concurrency=1, base_delay=0.01)
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        executor.call(broken, cancel_event=threading.Event())
+    assert len(attempts) == 1
+    executor.shutdown()
+
+
+def test_cancel_event_stops_map_without_waiting_for_calls_in_flight():
+    llm = FakeChatModel(latency=1.0)
+    executor = LLMExecutor(max_concurrency=2)
+    cancel_event = threading.Event()
+    threading.Timer(0.1, cancel_event.set).start()
+
+    started = time.perf_counter()
+    with pytest.raises(CancelledError):
+        executor.map(lambda i: llm.invoke(f"item {i}").content, list(range(8)), cancel_event=cancel_event)
+
+    assert time.perf_counter() - started < 0.5
+    # Queued calls were dropped rather than sent
+    assert llm.requests <= 2
+    executor.shutdown()
+
+
+def test_cancelling_one_run_leaves_the_executor_usable():
+    llm = FakeChatModel(latency=0.2)
+    processor = make_processor(llm, max_concurrency=2)
+    srt = "".join(f"{i + 1}\n00:00:{i:02d},000 --> 00:00:{i:02d},900\nline {i} of the talk\n\n" for i in range(30))
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    with pytest.raises(CancelledError):
+        processor.process_srt(srt, cancel_event=cancel_event)
+
+    result = processor.process_srt(srt)
+    assert len(result['chapter_summaries']) == len(result['chapters'])
+    processor.executor.shutdown()
+
+
+def test_shutdown_drops_queued_calls():
+    llm = FakeChatModel(latency=0.2)
+    executor = LLMExecutor(max_concurrency=1)
+    futures = [executor._submit(lambda: llm.invoke("slow").content, 0, threading.Event()) for _ in range(4)]
+    time.sleep(0.05)
+
+    executor.shutdown()
+
+    assert [future.cancelled() for future in futures] == [False, True, True, True]
+    assert futures[0].result(timeout=1) == "slow"
@@ -0,0 +1,16 @@
+# tests/test_processor.py
+
+import pytest
+from chappie_bench import FakeChatModel, make_processor
+
+
+@pytest.mark.parametrize("mode", ["map_reduce", "chapters"])
+def test_empty_transcript_makes_no_requests(mode):
+    llm = FakeChatModel(latency=0)
+    processor = make_processor(llm, overall_summary_mode=mode)
+
+    result = processor.process_srt("")
+
+    assert result == {'chapters': [], 'chapter_summaries': [], 'overall_summary': ""}
+    assert llm.requests == 0
+    processor.executor.shutdown()